@@ -6,74 +6,88 @@
 
 Imports="""#!/usr/bin/env python
 
+import sys
 import numpy as np
-from mtbench import bench, progress
+from mtbench import bench, cached_grid, run_study
 from _REFERENCE import fullpath, names, depths, magnitudes,\\
     data_processing, misfit_functions, selected_events, expected_results
-from mtuq.grid import DoubleCoupleGridRegular
+
+
+# weight file within each event directory
+weight_file = 'weights.dat'
 
 """
 
 
 Docstring="""
-if __name__=='__main__':
-    _i, _n = 1, len(selected_events)
-
+def run_event(event_id, grid=None, **options):
     #
-    # loop over selected events from REFERENCE
+    # runs a single event from REFERENCE
     #
 """
 
 
 Main="""
-    for index in selected_events:
-        progress(_i, _n)
+    index = names.index(event_id)
+    depth = depths[index]
+    magnitude = magnitudes[index]
 
-        event_id = names[index]
-        depth = depths[index]
-        magnitude = magnitudes[index]
+    model = MODEL
+    solver = SOLVER
 
-        model = MODEL
-        solver = SOLVER
+    path_data, path_weights, path_greens = ( 
+        fullpath(event_id, '*BH.[zrt]'), 
+        fullpath(event_id, weight_file),
+        PATH_GREENS,
+        )
 
-        path_data, path_weights, path_greens = ( 
-            fullpath(event_id, '*BH.[zrt]'), 
-            fullpath(event_id, 'weights.dat'),
-            PATH_GREENS,
-            )
-
-        grid = DoubleCoupleGridRegular(
+    if grid is None:
+        grid = cached_grid('dc',
             npts_per_axis=40,
             magnitudes=[magnitude],
             )
 
-        process_bw, process_sw = data_processing(
-            path_greens, path_weights,
-            )
+    process_bw, process_sw = data_processing(
+        path_greens, path_weights,
+        )
+
+    options = dict(dict(
+        path_archive=fullpath(event_id+'.mtba'),
+        include_bw=False,
+        include_rayleigh=True,
+        include_love=True,
+        include_mt=True,
+        include_force=False,
+        plot_beachball=True,
+        plot_waveforms=True,
+        dc_misfit=True,
+        ), **options)
+
+    return bench(
+        event_id,
+        path_data,
+        path_greens,
+        path_weights,
+        solver,
+        model,
+        grid,
+        magnitude,
+        depth,
+        process_bw,
+        process_sw,
+        **options)
 
-        bench(
-            event_id,
-            path_data,
-            path_greens,
-            path_weights,
-            solver,
-            model,
-            grid,
-            magnitude,
-            depth,
-            process_bw,
-            process_sw,
-            include_bw=False,
-            include_rayleigh=True,
-            include_love=True,
-            include_mt=True,
-            include_force=False,
-            plot_beachball=True,
-            plot_waveforms=True,
-            dc_misfit=True,
-            )
 
-        _i += 1
+if __name__=='__main__':
+    #
+    # run selected events from REFERENCE, printing output as it goes
+    #
+
+    summaries = run_study(run_event, [names[index] for index in selected_events],
+        path_logs=None)
+
+    if any(summary['status'] != 'ok' for summary in summaries):
+        sys.exit(1)
 
 """
 
@@ -223,8 +237,8 @@ if __name__=='__main__':
             lines)
 
         lines = re.sub(
-            'DoubleCoupleGridRegular',
-            'FullMomentTensorGridSemiregular',
+            "'dc'",
+            "'semiregular'",
             lines)
 
         lines = re.sub(
@@ -272,8 +286,8 @@ if __name__=='__main__':
             lines)
 
         lines = re.sub(
-            'DoubleCoupleGridRegular',
-            'FullMomentTensorGridSemiregular',
+            "'dc'",
+            "'semiregular'",
             lines)
 
         lines = re.sub(
@@ -316,8 +330,8 @@ if __name__=='__main__':
             lines)
 
         lines = re.sub(
-            'DoubleCoupleGridRegular',
-            'FullMomentTensorGridSemiregular',
+            "'dc'",
+            "'semiregular'",
             lines)
 
         lines = re.sub(
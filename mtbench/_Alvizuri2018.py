@@ -6,6 +6,8 @@ from os.path import abspath, dirname, join
 from mtuq.misfit import Misfit
 from mtuq.process_data import ProcessData
 
+from mtbench._decimate import decimated
+
 
 def moment(Mw):
     return 10.**(1.5*Mw + 9.1)
@@ -143,7 +145,7 @@ expected_results = [
 
 
 def data_processing(
-        path_greens, path_weights):
+        path_greens, path_weights, decimate=False):
 
     process_bw = ProcessData(
         filter_type='Bandpass',
@@ -168,11 +170,14 @@ def data_processing(
         apply_statics=True,
         ) 
 
+    if decimate:
+        process_bw, process_sw = decimated(process_bw), decimated(process_sw)
+
     return process_bw, process_sw
 
 
 def data_processing_FK(
-        path_greens, path_weights):
+        path_greens, path_weights, decimate=False):
 
     process_bw = ProcessData(
         filter_type='Bandpass',
@@ -197,6 +202,9 @@ def data_processing_FK(
         apply_statics=True,
         )
 
+    if decimate:
+        process_bw, process_sw = decimated(process_bw), decimated(process_sw)
+
     return process_bw, process_sw
 
 
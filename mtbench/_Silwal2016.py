@@ -6,6 +6,8 @@ from os.path import abspath, dirname, join
 from mtuq.misfit import Misfit
 from mtuq.process_data import ProcessData
 
+from mtbench._decimate import decimated
+
 
 names = [
     '20070911234634153', #0
@@ -102,7 +104,7 @@ expected_results = None
 
 
 def data_processing(
-        path_greens, path_weights):
+        path_greens, path_weights, decimate=False):
 
     process_bw = ProcessData(
         filter_type='Bandpass',
@@ -126,11 +128,14 @@ def data_processing(
         capuaf_file=path_weights,
         ) 
 
+    if decimate:
+        process_bw, process_sw = decimated(process_bw), decimated(process_sw)
+
     return (process_bw, process_sw)
 
 
 def data_processing_FK(
-        path_greens, path_weights):
+        path_greens, path_weights, decimate=False):
 
     process_bw = ProcessData(
         filter_type='Bandpass',
@@ -154,6 +159,9 @@ def data_processing_FK(
         capuaf_file=path_weights,
         )
 
+    if decimate:
+        process_bw, process_sw = decimated(process_bw), decimated(process_sw)
+
     return process_bw, process_sw
 
 
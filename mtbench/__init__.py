@@ -4,7 +4,9 @@ import os
 import numpy as np
 import warnings
 from os.path import exists, join
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from math import prod
+from time import perf_counter, process_time
 
 from mtuq import read, open_db, download_greens_tensors
 from mtuq.graphics import plot_data_greens1, plot_data_greens2,\
@@ -13,15 +15,34 @@ from mtuq.graphics import plot_data_greens1, plot_data_greens2,\
     plot_misfit_dc, plot_likelihood_dc, plot_marginal_dc,\
     plot_variance_reduction_lune, plot_time_shifts, plot_amplitude_ratios,\
     plot_cdf, plot_pdf, plot_screening_curve,\
-    plot_beachball
+    plot_beachball, plot_misfit_depth
+from mtuq.greens_tensor.base import GreensTensorList
 from mtuq.grid import UnstructuredGrid
-from mtuq.grid_search import DataArray, DataFrame, grid_search, MTUQDataArray
+from mtuq.grid_search import DataArray, DataFrame, grid_search,\
+    MTUQDataArray, MTUQDataFrame
 from mtuq.misfit import Misfit
 from mtuq.misfit.waveform._stats import estimate_sigma, calculate_norm_data
 from mtuq.util.cap import parse_station_codes, Trapezoid
 from mtuq.util.math import list_intersect_with_indices
 from mtuq.util.signal import get_components
 
+from mtbench._adaptive import AdaptiveSearch
+from mtbench._archive import is_current, read_archive
+from mtbench._cache import ResultCache, GreensCache, cache_key,\
+    file_signature, file_hash
+from mtbench._database import DatabasePool
+from mtbench._decimate import Decimate, decimated
+from mtbench._figures import FigureExecutor
+from mtbench._grid import FullMomentTensorGridQuasiRandom, cached_grid,\
+    source_chunks
+from mtbench._magnitude import profile_magnitude
+from mtbench._plan import GreensPlan
+from mtbench._pruning import Pruning
+from mtbench._report import Report, NullReport
+from mtbench._shared import share, attach, shared_array, load_shared_array
+from mtbench._store import StationStore, open_station_store
+from mtbench._study import run_pipeline, run_study
+
 
 # workaround name conflicts
 _plot_beachball = plot_beachball
@@ -67,16 +88,69 @@ def bench(
     omega_cdfs=False,
     screening_curves=False,
     station_contributions=True,
+    station_batching=True,
+    station_workers=1,
+    station_store=True,
+    path_cache=None,
+    path_greens_cache=None,
+    figure_workers=1,
+    adaptive=False,
+    adaptive_levels=6,
+    adaptive_keep=10,
+    adaptive_children=100,
+    magnitude_profile=False,
+    prune_top_k=None,
+    prune_sample=1000,
+    depths=None,
+    path_archive=None,
+    db_pool=None,
+    greens_plan=None,
+    decimate=False,
+    prefetch_only=False,
+    prefetched=None,
+    figures=None,
     path_output='.',
     verbose=True):
 
     """ Carries out a separate grid search for each chosen data type and
     performs simple statistical analyses
+
+    Returns the best-fitting source as a dictionary of grid coordinates
+
+    If a list of `depths` is given, data are read and processed once and
+    misfit is evaluated at each depth, adding an origin dimension to the
+    misfit surfaces
+
+    For pipelined studies, ``prefetch_only=True`` stops after reading and
+    processing, returning what a later call takes as `prefetched`, and an
+    external FigureExecutor can be given as `figures`, in which case plots
+    are submitted but not waited on
+
+    A DatabasePool given as `db_pool` keeps Green's function databases open
+    between events, and a GreensPlan given as `greens_plan` supplies Green's
+    tensors extracted once for a whole study
+
+    With `decimate`, processed data and Green's tensors are decimated to a
+    rate set by the upper filter corners before misfit evaluation
     """
 
     #
     # parameter checking
     #
+    if prune_top_k and any((
+        lune_misfit, lune_likelihood, lune_marginal, lune_variance_reduction,
+        vw_misfit, vw_likelihood, vw_marginal,
+        dc_misfit, dc_likelihood, dc_marginal,
+        omega_pdfs, omega_cdfs, screening_curves,
+        )):
+        # pruned grid points hold no misfit values
+        print('Misfit surface figures are not available with pruning')
+        lune_misfit = lune_likelihood = lune_marginal = False
+        lune_variance_reduction = False
+        vw_misfit = vw_likelihood = vw_marginal = False
+        dc_misfit = dc_likelihood = dc_marginal = False
+        omega_pdfs = omega_cdfs = screening_curves = False
+
     if any((
         lune_likelihood,
         lune_marginal,
@@ -98,12 +172,26 @@ def bench(
 
     if omega_pdfs or omega_cdfs:
         try:
-            assert type(grid)==UnstructuredGrid
+            assert isinstance(grid, UnstructuredGrid)
         except:
             print('Angular distance CDFs and PDFs require randomly-spaced grid')
             omega_pdfs = False
             omega_cdfs = False
 
+    if adaptive and magnitude_profile:
+        raise ValueError('Adaptive search and magnitude profiling are exclusive')
+
+    if depths is not None and (adaptive or magnitude_profile or prune_top_k):
+        raise ValueError('Depth scans require a fixed grid without '
+            'magnitude profiling or pruning')
+
+    if prune_top_k and (adaptive or magnitude_profile):
+        raise ValueError('Pruning requires a fixed grid without magnitude profiling')
+
+    if (adaptive or magnitude_profile or prune_top_k) and station_contributions:
+        print('Station contributions require a fixed grid')
+        station_contributions = False
+
 
     labels = []
     if include_bw:
@@ -113,6 +201,12 @@ def bench(
     if include_love:
         labels += ['love']
 
+    if decimate:
+        if include_bw:
+            process_bw = decimated(process_bw)
+        if include_rayleigh or include_love:
+            process_sw = decimated(process_sw)
+
     data_processing = []
     if include_bw:
         data_processing += [process_bw]
@@ -146,104 +240,174 @@ def bench(
              int(include_rayleigh)+\
              int(include_love)
 
+    # per-phase timing and memory, written next to the event's outputs
+    report = Report(event_id, solver=solver, model=model,
+        grid_type=type(grid).__name__, grid_size=grid.size,
+        data_types=labels)
+
 
     #
-    # The main I/O work starts now
+    # Optionally, results from an earlier run with identical inputs are reused
     #
 
-    print('Reading data...\n')
+    cache, cached = None, None
 
-    data = read(path_data, format='sac',
-        event_id=event_id,
-        station_id_list=parse_station_codes(path_weights),
-        tags=['units:cm', 'type:velocity']) 
+    if path_cache:
+        cache = ResultCache(path_cache, cache_key(
+            event_id,
+            file_signature(path_data),
+            file_signature(path_archive) if path_archive else None,
+            file_hash(path_weights),
+            path_greens, solver, model, include_mt, include_force,
+            data_processing, misfit_functions, labels,
+            grid, magnitude, depth, depths,
+            adaptive and (adaptive_levels, adaptive_keep, adaptive_children),
+            magnitude_profile, prune_top_k, prune_sample))
 
-    data.sort_by_distance()
-    stations = data.get_stations()
+        with report.phase('load_cache') as info:
+            cached = cache.load(
+                need_sigma=calculate_sigma,
+                need_norms=calculate_norm_data,
+                need_stations=station_contributions)
+            info['hit'] = cached is not None
 
-    origin = data.get_origins()[0]
-    origin.depth_in_m = depth
-
-    processed_data = []
-    for process_data in data_processing:
-        processed_data += [data.map(process_data)]
 
+    #
+    # The main I/O work starts now
+    #
 
-    print('Reading Green''s functions...\n')
+    if prefetch_only:
+        if cached is None or plot_waveforms:
+            return _load(
+                event_id, path_data, path_weights, path_greens, solver, model,
+                include_mt, include_force, magnitude,
+                [depth] if depths is None else depths, data_processing,
+                path_greens_cache, path_archive, db_pool, greens_plan, report)
+        return None
 
-    print('SOLVER:', solver)
-    db = open_db(path_greens, format=solver,
-        model=model, include_mt=include_mt, include_force=include_force)
+    if prefetched is not None:
+        stations, origins, processed_data, processed_greens = prefetched
 
-    greens = db.get_greens_tensors(stations, origin, model)
+        # grid_search takes a list of origins for depth scans
+        origin = origins[0] if depths is None else origins
 
-    greens.convolve(Trapezoid(magnitude=magnitude))
+    elif cached is None or plot_waveforms:
+        stations, origins, processed_data, processed_greens = _load(
+            event_id, path_data, path_weights, path_greens, solver, model,
+            include_mt, include_force, magnitude,
+            [depth] if depths is None else depths, data_processing,
+            path_greens_cache, path_archive, db_pool, greens_plan, report)
 
-    processed_greens = []
-    for process_data in data_processing:
-        processed_greens += [greens.map(process_data)]
+        # grid_search takes a list of origins for depth scans
+        origin = origins[0] if depths is None else origins
 
 
     #
     # The main computational work starts nows
     #
 
-    print('Evaluating misfit...\n')
-
-    # holds misfit surfaces from each individual stations and data type
-    station_array = []
-
-    # sum over stations to obtain misfit surfaces from each individual data type
-    results_sum = []
-
-    for _i, misfit in enumerate(misfit_functions):
-        task(_i, ntasks)
-        station_array += [[]]
-
-        for _j, station in enumerate(stations):
-            print(f'\n  {station.id}\n')
-
-            station_array[-1] += [grid_search(
-                processed_data[_i].select(station), processed_greens[_i].select(station), 
-                misfit, origin, grid, verbose=0)]
-
-        results_sum += [MTUQDataArray(**{
-            'data': np.sum(station_array[-1], axis=0)/len(stations),
-            'coords': station_array[-1][0].coords,
-            'dims': station_array[-1][0].dims,
-            })]
-
-    if calculate_norm_data:
-        print('  calculating data norm...\n')
-    
-        norms = []
-        for _i, misfit in enumerate(misfit_functions):
-    
-            groups = misfit.time_shift_groups
-            if len(groups) > 1:
-               print('Too many time shift groups. Skipping...')
-               continue
-
-            components = []
-            for component in groups[0]:
-               components += [component]
-
-            norms += [_calculate_norm_data(processed_data[_i], misfit.norm, components)]
-
-            _write(event_id+'_'+str(_i)+'.norm_data', norms[-1])
-
-
-    if include_rayleigh and include_love:
-        idx_rayleigh = labels.index('rayleigh')
-        idx_love = labels.index('love')
-
-        results_sum += [results_sum[idx_rayleigh] + results_sum[idx_love]]
-        norms += [2.]
-        labels += ['rayleigh+love']
-
-        #results_sum += [sum([results_sum[_i]*norms[_i] for _i in range(len(results_sum))])]
-        #norms += [norms[idx_rayleigh] + norms[idx_love]]
-        #labels += ['rayleigh+love_2']
+    if cached is not None:
+        print('Loading cached results...\n')
+        print('  %s\n' % cache.dirname)
+
+        stations = cached['stations']
+        origin = cached['origin']
+        origins = [origin] if depths is None else origin
+        labels = cached['labels']
+        norms = cached['norms']
+        devs = cached['devs']
+        results_sum = cached['results_sum']
+
+        if adaptive:
+            grid = cached['grid']
+
+        station_array = []
+        if station_contributions:
+            store = open_station_store(join(cache.dirname, 'station_store'))
+            station_array = [store.surfaces(label) for label in store.labels]
+
+    else:
+        print('Evaluating misfit...\n')
+
+        # optionally, per-station surfaces go to disk as they are computed
+        store = None
+        if cache and station_contributions:
+            cache.start()
+            store = StationStore(join(cache.staging, 'station_store'))
+        elif station_contributions and station_store:
+            store = StationStore(path_output+'/'+event_id+'_station_store')
+
+        # data types are weighted equally unless data norms are calculated
+        norms = [1. for _ in misfit_functions]
+        if calculate_norm_data:
+            print('  calculating data norm...\n')
+            with report.phase('norm'):
+                norms = _calculate_norms(event_id, processed_data, misfit_functions)
+
+        # weight of each data type in the weighted sum minimized below, in
+        # which rayleigh and love also enter through the rayleigh+love entry
+        weights = list(norms)
+        if include_rayleigh and include_love:
+            weights[labels.index('rayleigh')] += 2.
+            weights[labels.index('love')] += 2.
+
+        if adaptive:
+            # the given grid is the coarse level; results cover the union of
+            # points evaluated at all levels
+            search = AdaptiveSearch(levels=adaptive_levels,
+                keep=adaptive_keep, children=adaptive_children,
+                weights=weights)
+
+            station_array = []
+            grid, results_sum = search(lambda _grid: _evaluate(
+                processed_data, processed_greens, misfit_functions, labels,
+                stations, origin, _grid, station_batching, station_workers,
+                False, None, verbose, report)[1], grid)
+
+            report.info['adaptive_grid_size'] = grid.size
+
+        elif magnitude_profile:
+            # only two magnitudes per source shape are evaluated; misfit at
+            # the others follows from linearity in scalar moment
+            station_array = []
+            results_sum, best_magnitudes = profile_magnitude(lambda _grid: _evaluate(
+                processed_data, processed_greens, misfit_functions, labels,
+                stations, origin, _grid, station_batching, station_workers,
+                False, None, verbose, report)[1], grid, misfit_functions)
+
+            for label, ds in zip(labels, best_magnitudes):
+                _save(path_output+'/'+event_id+'_best_magnitude_'+label, ds)
+
+        elif prune_top_k:
+            # only the k best sources are exact; the bound applies to the
+            # weighted sum minimized below
+            pruning = Pruning(k=prune_top_k, sample_size=prune_sample,
+                weights=weights)
+
+            station_array, results_sum = _evaluate(
+                processed_data, processed_greens, misfit_functions, labels,
+                stations, origin, grid, station_batching, station_workers,
+                False, None, verbose, report, pruning)
+
+            report.info['pruning_skipped'] = pruning.skipped
+
+        else:
+            station_array, results_sum = _evaluate(
+                processed_data, processed_greens, misfit_functions, labels,
+                stations, origin, grid, station_batching, station_workers,
+                station_contributions, store, verbose, report)
+
+        if include_rayleigh and include_love:
+            idx_rayleigh = labels.index('rayleigh')
+            idx_love = labels.index('love')
+
+            results_sum += [results_sum[idx_rayleigh] + results_sum[idx_love]]
+            norms += [2.]
+            labels += ['rayleigh+love']
+
+            #results_sum += [sum([results_sum[_i]*norms[_i] for _i in range(len(results_sum))])]
+            #norms += [norms[idx_rayleigh] + norms[idx_love]]
+            #labels += ['rayleigh+love_2']
 
 
     # what index corresponds to minimum misfit?
@@ -251,31 +415,33 @@ def bench(
     idx = results_weighted.source_idxmin()
     best_source = grid.get(idx)
     source_dict = grid.get_dict(idx)
+    report.info['best_misfit'] = float(np.nanmin(np.asarray(results_weighted.values)))
+
+    best_origin = origins[0]
+    if depths is not None:
+        best_origin = origins[results_weighted.origin_idxmin()]
+        report.info['best_depth'] = best_origin.depth_in_m
+
+    if cached is None:
+        devs = None
+        if calculate_sigma:
+            print('  estimating variance...\n')
+            with report.phase('sigma'):
+                devs = _estimate_sigmas(event_id, processed_data,
+                    [greens.select(best_origin) for greens in processed_greens],
+                    misfit_functions, best_source)
+
+        if cache:
+            with report.phase('save_cache'):
+                if not station_contributions:
+                    cache.start()
+                cache.save(results_sum,
+                    stations=stations, origin=origin, labels=labels,
+                    norms=norms, devs=devs,
+                    grid=grid if adaptive else None)
 
     if calculate_sigma:
-        print('  estimating variance...\n')
-
-        devs = []
-        vars = []
-
-        for _i, misfit in enumerate(misfit_functions):
-
-            groups = misfit.time_shift_groups
-            if len(groups) > 1:
-               print('Too many time shift groups. Skipping...')
-               continue
-
-            components = []
-            for component in groups[0]:
-               components += [component]
-
-            devs += [estimate_sigma(processed_data[_i], processed_greens[_i],
-                best_source, misfit.norm, components,
-                misfit.time_shift_min, misfit.time_shift_max)]
-
-            vars += [devs[-1]**2]
-
-            _write(event_id+'_'+str(_i)+'.sigma', devs[-1])
+        vars = [dev**2 for dev in devs]
 
 
     #
@@ -283,18 +449,23 @@ def bench(
     #
     print('Generating figures...\n')
 
+    # independent plots, optionally run in parallel
+    external = figures is not None
+    if not external:
+        figures = FigureExecutor(figure_workers)
+
     if plot_beachball:
         print('  plotting beachball...\n')
 
-        _plot_beachball(path_output+'/'+event_id+'_beachball.png',
-            best_source, stations, origin)
+        figures.submit(_plot_beachball, path_output+'/'+event_id+'_beachball.png',
+            best_source, stations, best_origin)
 
     if plot_waveforms:
         print('  plotting waveforms...\n')
 
-        _plot_waveforms(path_output+'/'+event_id+'_waveforms.png',
+        figures.submit(_plot_waveforms, path_output+'/'+event_id+'_waveforms.png',
             processed_data,
-            processed_greens,
+            [greens.select(best_origin) for greens in processed_greens],
             include_bw,
             bool(include_rayleigh or include_love),
             process_bw,
@@ -302,78 +473,85 @@ def bench(
             minmax_bw,
             minmax_sw,
             stations,
-            origin,
+            best_origin,
             best_source,
             source_dict)
 
     if lune_misfit:
         print('  plotting misfit...')
-        _map(path_output+'/'+event_id+'_misfit_lune', labels, plot_misfit_lune, results_sum)
+        _map(figures, path_output+'/'+event_id+'_misfit_lune', labels, plot_misfit_lune, results_sum)
 
     if lune_likelihood:
         print('  plotting maximum likelihoods...')
-        _map(path_output+'/'+event_id+'_likelihood_lune', labels, plot_likelihood_lune, results_sum, vars)
+        _map(figures, path_output+'/'+event_id+'_likelihood_lune', labels, plot_likelihood_lune, results_sum, vars)
 
     if lune_marginal:
         print('  plotting marginal likelihoods...')
-        _map(path_output+'/'+event_id+'_marginal_lune', labels, plot_marginal_lune, results_sum, vars)
+        _map(figures, path_output+'/'+event_id+'_marginal_lune', labels, plot_marginal_lune, results_sum, vars)
 
     if lune_variance_reduction:
         print('  plotting variance reduction...')
-        _map(path_output+'/'+event_id+'_variance_reduction', labels, plot_variance_reduction_lune, results_sum, [1. for _ in range(len(results_sum))])
+        _map(figures, path_output+'/'+event_id+'_variance_reduction', labels, plot_variance_reduction_lune, results_sum, [1. for _ in range(len(results_sum))])
 
 
     if vw_misfit:
         print('  plotting misfit...')
-        _map(path_output+'/'+event_id+'_misfit_vw', labels, plot_misfit_vw, results_sum)
+        _map(figures, path_output+'/'+event_id+'_misfit_vw', labels, plot_misfit_vw, results_sum)
 
     if vw_likelihood:
         print('  plotting maximum likelihoods...')
-        _map(path_output+'/'+event_id+'_likelihood_vw', labels, plot_likelihood_vw, results_sum, vars)
+        _map(figures, path_output+'/'+event_id+'_likelihood_vw', labels, plot_likelihood_vw, results_sum, vars)
 
     if vw_marginal:
         print('  plotting marginal likelihoods...')
-        _map(path_output+'/'+event_id+'_marginal_vw', labels, plot_marginal_vw, results_sum, vars)
+        _map(figures, path_output+'/'+event_id+'_marginal_vw', labels, plot_marginal_vw, results_sum, vars)
 
 
     if dc_misfit:
         print('  plotting misfit...')
-        _map(path_output+'/'+event_id+'_misfit_dc', labels, plot_misfit_dc, results_sum)
+        _map(figures, path_output+'/'+event_id+'_misfit_dc', labels, plot_misfit_dc, results_sum)
 
     if dc_likelihood:
         print('  plotting maximum likelihoods...')
-        _map(path_output+'/'+event_id+'_likelihood_dc', labels, plot_likelihood_dc, results_sum, vars)
+        _map(figures, path_output+'/'+event_id+'_likelihood_dc', labels, plot_likelihood_dc, results_sum, vars)
 
     if dc_marginal:
         print('  plotting maximum likelihoods...')
-        _map(path_output+'/'+event_id+'_marginal_dc', labels, plot_marginal_dc, results_sum, vars)
+        _map(figures, path_output+'/'+event_id+'_marginal_dc', labels, plot_marginal_dc, results_sum, vars)
 
 
     if omega_pdfs:
         print('  plotting angular distance PDFs...')
-        _map(path_output+'/'+event_id+'_omega', [label+'_pdf' for label in labels], plot_pdf, results_sum, vars)
+        _map(figures, path_output+'/'+event_id+'_omega', [label+'_pdf' for label in labels], plot_pdf, results_sum, vars)
 
     if omega_cdfs:
         print('  plotting angular distance CDFs...')
-        _map(path_output+'/'+event_id+'_omega', [label+'_cdf' for label in labels], plot_cdf, results_sum, vars)
+        _map(figures, path_output+'/'+event_id+'_omega', [label+'_cdf' for label in labels], plot_cdf, results_sum, vars)
 
     if screening_curves:
         print('  plotting explosion screening curves...')
-        _map(path_output+'/'+event_id+'_curves', labels, plot_screening_curve, results_sum, vars)
+        _map(figures, path_output+'/'+event_id+'_curves', labels, plot_screening_curve, results_sum, vars)
+
+    if depths is not None:
+        print('  plotting misfit versus depth...')
+        _map(figures, path_output+'/'+event_id+'_misfit_depth', labels, plot_misfit_depth, results_sum, [origins]*len(results_sum))
+
+        _write_depths(path_output+'/'+event_id+'_depths.txt', labels, results_sum, origins)
 
 
     if station_contributions:
         os.makedirs(path_output+'/'+event_id+f'_station_contributions',exist_ok=True)
 
-        for _i, station in enumerate(stations):
-            plot_variance_reduction_lune(
-                path_output+'/'+event_id+f'_station_contributions/rayleigh_{station.id}.png',
-                station_array[0][_i],[1.], title=station.id)
-    
-            plot_variance_reduction_lune(
-                path_output+'/'+event_id+f'_station_contributions/love_{station.id}.png',
-                station_array[1][_i],[1.], title=station.id)
+        for label, surfaces in zip(labels, station_array):
+            for _i, station in enumerate(stations):
+                figures.submit(plot_variance_reduction_lune,
+                    path_output+'/'+event_id+f'_station_contributions/{label}_{station.id}.png',
+                    surfaces[_i],[1.], title=station.id)
 
+    # external executors are waited on by the caller
+    if not external:
+        for filename, elapsed in figures.wait():
+            report.add('figure', elapsed, filename=filename)
 
     #
     # Saving results
@@ -382,22 +560,28 @@ def bench(
     if save_misfit:
         print('Saving results...\n')
 
-        for _i, ds in enumerate(results_sum):
-            task(_i, ntasks)
-            _save(event_id+'_'+str(_i), ds)
+        with report.phase('save'):
+            for _i, ds in enumerate(results_sum):
+                task(_i, ntasks)
+                _save(event_id+'_'+str(_i), ds)
+
+    report.info['nstations'] = len(stations)
+    report.write(path_output+'/'+event_id+'_report.json')
 
 
     print('\nFinished\n')
 
+    return source_dict
+
 
 
 #
 # graphics
 #
 
-def _map(dirname, labels, func, *sequences, **kwargs):
+def _map(figures, dirname, labels, func, *sequences, **kwargs):
     """ Used to map plotting function onto a sequence of misfit or likelihood
-    surfaces
+    surfaces, submitting each plot to a FigureExecutor
     """
 
     os.makedirs(dirname, exist_ok=True)
@@ -406,7 +590,7 @@ def _map(dirname, labels, func, *sequences, **kwargs):
         filename = join(dirname, '%s.png' % labels[_i])
 
         # call plotting function
-        func(filename, *arg_list, **kwargs)
+        figures.submit(func, filename, *arg_list, **kwargs)
 
 
 def _plot_waveforms(filename,
@@ -446,6 +630,485 @@ def _plot_waveforms(filename,
             source_dict)
 
 
+#
+# data and Green's functions
+#
+
+def _load(event_id, path_data, path_weights, path_greens, solver, model,
+    include_mt, include_force, magnitude, depths, data_processing,
+    path_greens_cache=None, path_archive=None, db_pool=None,
+    greens_plan=None, report=NullReport()):
+    """ Reads and processes data once, and Green's functions for each depth
+
+    Data are read from a packed archive instead of SAC files if
+    `path_archive` exists, the database is taken from `db_pool` if given,
+    and tensors from `greens_plan` if given
+    """
+    print('Reading data...\n')
+
+    with report.phase('read_data'):
+        data = _read_data(event_id, path_data, path_weights, path_archive)
+
+    stations = data.get_stations()
+    origins = _get_origins(data, depths)
+
+    # a processing pipeline given for several data types is computed only
+    # once and shared between them. Pipelines are compared by identity, which
+    # data_processing keeps stable while the memo is in use
+    keys = [id(process_data) for process_data in data_processing]
+    memo = dict(zip(keys, data_processing))
+
+    timings = {}
+
+    start = perf_counter()
+    with report.phase('process_data', pipelines=len(memo)):
+        processed = {key: data.map(memo[key]) for key in memo}
+    processed_data = [processed[key] for key in keys]
+    timings['data'] = perf_counter() - start
+
+
+    print('Reading Green''s functions...\n')
+
+    stf = Trapezoid(magnitude=magnitude)
+
+    caches = {}
+    if path_greens_cache:
+        caches = {key: GreensCache(path_greens_cache, solver, model, path_greens,
+            include_mt, include_force, stf, memo[key]) for key in memo}
+
+    # cached tensors for each depth and processing pipeline, None where not
+    # yet cached
+    cached = [{key: caches[key].load(stations, origin) for key in caches}
+        for origin in origins]
+
+    missing = [[station for _j, station in enumerate(stations)
+        if not caches or any(tensors[_j] is None for tensors in _cached.values())]
+        for _cached in cached]
+
+    if any(missing):
+        print('SOLVER:', solver)
+        with report.phase('read_greens', nstations=sum(map(len, missing)),
+            norigins=len(origins)):
+            with report.phase('open_db', pooled=db_pool is not None):
+                if db_pool is None:
+                    db = open_db(path_greens, format=solver, model=model,
+                        include_mt=include_mt, include_force=include_force)
+                else:
+                    db = db_pool.open(path_greens, solver, model,
+                        include_mt, include_force)
+
+            if greens_plan is not None:
+                if greens_plan.solver != solver:
+                    raise ValueError("Green's tensor plan is for %s, not %s" % (
+                        greens_plan.solver, solver))
+                greens = [greens_plan.get(db, missing[_k], origins[_k], model)
+                    if missing[_k] else None for _k in range(len(origins))]
+            else:
+                # remote databases are queried for all depths at once
+                greens = _get_greens_tensors(db, missing, origins, model,
+                    workers=len(origins) if solver == 'syngine' else 1)
+
+        with report.phase('convolve'):
+            for tensors in greens:
+                if tensors is not None:
+                    tensors.convolve(stf)
+
+    start = perf_counter()
+    processed = {}
+    with report.phase('process_greens', pipelines=len(memo)):
+        for key, process_data in memo.items():
+            tensors = []
+            for _k, origin in enumerate(origins):
+                if not caches:
+                    tensors += list(greens[_k].map(process_data))
+                    continue
+
+                if missing[_k]:
+                    fetched = greens[_k].map(process_data)
+                    caches[key].save(fetched, origin)
+                    fetched = {tensor.station.id: tensor for tensor in fetched}
+
+                tensors += [tensor if tensor is not None else fetched[station.id]
+                    for station, tensor in zip(stations, cached[_k][key])]
+
+            processed[key] = GreensTensorList(tensors)
+
+    processed_greens = [processed[key] for key in keys]
+    timings['greens'] = perf_counter() - start
+
+    if caches:
+        print("  %d of %d stations read from Green's function cache\n" % (
+            len(stations)*len(origins)-sum(map(len, missing)),
+            len(stations)*len(origins)))
+
+    # each distinct pipeline was timed once; report what repeating it for
+    # every data type would have cost
+    npipelines, ntypes = len(memo), len(keys)
+    print('  processing: %d data types, %d distinct pipelines' % (ntypes, npipelines))
+    for name, elapsed in timings.items():
+        print('    %-7s %8.2f s  (saved ~%.2f s)' % (
+            name, elapsed, elapsed/npipelines*(ntypes-npipelines)))
+    print()
+
+    return stations, origins, processed_data, processed_greens
+
+
+def _read_data(event_id, path_data, path_weights, path_archive=None):
+    """ Reads data for the stations listed in the weight file, sorted by
+    distance
+
+    A packed archive is read instead of the SAC files only if it is current
+    with them
+    """
+    if path_archive and exists(path_archive) and\
+        not is_current(path_archive, path_data):
+        print('  %s is older than the SAC files, which are read instead\n' %
+            path_archive)
+        path_archive = None
+
+    if path_archive and exists(path_archive):
+        print('  %s\n' % path_archive)
+        data = read_archive(path_archive,
+            event_id=event_id,
+            station_id_list=parse_station_codes(path_weights),
+            tags=['units:cm', 'type:velocity'])
+    else:
+        data = read(path_data, format='sac',
+            event_id=event_id,
+            station_id_list=parse_station_codes(path_weights),
+            tags=['units:cm', 'type:velocity']) 
+
+    data.sort_by_distance()
+    return data
+
+
+def _get_origins(data, depths):
+    """ Returns a copy of the data's origin at each depth
+    """
+    origin = data.get_origins()[0]
+
+    origins = []
+    for depth in depths:
+        origins += [origin.copy()]
+        setattr(origins[-1], 'depth_in_m', depth)
+    return origins
+
+
+def _get_greens_tensors(db, stations, origins, model, workers=1):
+    """ Returns Green's tensors for each origin, or None for origins with no
+    stations to fetch, optionally fetching origins in concurrent threads
+    """
+    def get(_k):
+        if not stations[_k]:
+            return None
+        return db.get_greens_tensors(stations[_k], origins[_k], model)
+
+    if workers <= 1:
+        return [get(_k) for _k in range(len(origins))]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(get, range(len(origins))))
+
+
+#
+# misfit evaluation
+#
+
+def _evaluate(processed_data, processed_greens, misfit_functions, labels,
+    stations, origin, grid, station_batching, station_workers,
+    station_contributions, store, verbose, report=NullReport(), pruning=None):
+    """ Evaluates misfit for each data type, returning per-station surfaces
+    and surfaces summed over stations
+    """
+    # holds misfit surfaces from each individual stations and data type
+    station_array = []
+
+    # sum over stations to obtain misfit surfaces from each individual data type
+    results_sum = []
+
+    ntasks = len(misfit_functions)
+
+    # grid_search evaluates every point at each origin of a depth scan
+    npts = grid.size*len(stations)*(len(origin) if isinstance(origin, list) else 1)
+
+    start = perf_counter()
+
+    if pruning:
+        with report.phase('prune_sample', npts=pruning.sample_size):
+            pruning.sample(processed_data, processed_greens, misfit_functions,
+                stations, grid)
+
+    for _i, misfit in enumerate(misfit_functions):
+        task(_i, ntasks)
+
+        if pruning:
+            with report.phase('misfit', data_type=labels[_i],
+                npts=npts):
+                total = grid_search(
+                    processed_data[_i], processed_greens[_i],
+                    pruning.wrap(_i, misfit, stations), origin, grid, verbose=0)
+
+            station_array += [[]]
+            results_sum += [total/len(stations)]
+            continue
+
+        if station_batching:
+            # one pass over the grid, summing over stations as we go
+            station_misfit = _StationMisfit(misfit, stations,
+                workers=station_workers,
+                keep=station_contributions,
+                store=store,
+                label=labels[_i],
+                report=report)
+
+            with report.phase('misfit', data_type=labels[_i],
+                npts=npts):
+                total = grid_search(
+                    processed_data[_i], processed_greens[_i],
+                    station_misfit, origin, grid, verbose=0)
+
+            station_array += [station_misfit.surfaces(total)]
+
+            results_sum += [total/len(stations)]
+            continue
+
+        station_array += [[]]
+
+        for _j, station in enumerate(stations):
+            print(f'\n  {station.id}\n')
+
+            station_array[-1] += [grid_search(
+                processed_data[_i].select(station), processed_greens[_i].select(station), 
+                misfit, origin, grid, verbose=0)]
+
+        results_sum += [_like(station_array[-1][0],
+            np.sum(station_array[-1], axis=0)/len(stations))]
+
+    if verbose:
+        elapsed = perf_counter() - start
+        print('  misfit evaluation took %.2f s (%.0f grid points/s)\n' % (
+            elapsed, npts*ntasks/elapsed))
+
+        if pruning:
+            print('  pruning skipped %.1f%% of station evaluations\n' % (
+                100.*pruning.skipped))
+
+    return station_array, results_sum
+
+
+def _calculate_norms(event_id, processed_data, misfit_functions):
+    norms = []
+    for _i, misfit in enumerate(misfit_functions):
+
+        groups = misfit.time_shift_groups
+        if len(groups) > 1:
+           print('Too many time shift groups. Using unit weight...')
+           norms += [1.]
+           continue
+
+        components = []
+        for component in groups[0]:
+           components += [component]
+
+        norms += [_calculate_norm_data(processed_data[_i], misfit.norm, components)]
+
+        _write(event_id+'_'+str(_i)+'.norm_data', norms[-1])
+
+    return norms
+
+
+def _estimate_sigmas(event_id, processed_data, processed_greens,
+    misfit_functions, best_source):
+    devs = []
+    for _i, misfit in enumerate(misfit_functions):
+
+        groups = misfit.time_shift_groups
+        if len(groups) > 1:
+           print('Too many time shift groups. Skipping...')
+           continue
+
+        components = []
+        for component in groups[0]:
+           components += [component]
+
+        devs += [estimate_sigma(processed_data[_i], processed_greens[_i],
+            best_source, misfit.norm, components,
+            misfit.time_shift_min, misfit.time_shift_max)]
+
+        _write(event_id+'_'+str(_i)+'.sigma', devs[-1])
+
+    return devs
+
+
+class _StationMisfit(object):
+    """ Wraps a misfit function so that a single grid search returns the sum
+    over stations while per-station surfaces are optionally kept
+
+    Station surfaces are added into a running sum as they arrive, one station
+    at a time in station order, which reproduces
+    ``np.sum(station_array, axis=0)`` exactly. Surfaces are kept only if
+    `keep` is True, in which case they can be written to an on-disk
+    StationStore, so that peak memory does not grow with the number of
+    stations
+
+    Grids are expanded to an array of sources once, which is then passed to
+    the misfit function for every station. Cached grids are instead scaled
+    and evaluated one block at a time, so their memory-mapped arrays are
+    never copied whole. With `workers` > 1, stations are split across worker
+    processes. Data, Green's tensors and sources are written to shared
+    memory once, and each worker hands back its surfaces through shared
+    memory as well
+    """
+    def __init__(self, misfit, stations, workers=1, keep=True,
+        store=None, label='misfit', report=NullReport(), verbose=True):
+        self.misfit = misfit
+        self.stations = stations
+        self.workers = workers
+        self.keep = keep
+        self.store = store
+        self.label = label
+        self.report = report
+        self.verbose = verbose
+        self.values = []
+        self.sources = None
+
+    def __getattr__(self, name):
+        if name == 'misfit':
+            raise AttributeError(name)
+        return getattr(self.misfit, name)
+
+    def __call__(self, data, greens, sources, *args, **kwargs):
+        # grid_search calls the misfit function once per origin, with the
+        # same grid each time
+        if hasattr(sources, 'to_array') and not hasattr(sources, 'chunks'):
+            if self.sources is None or self.sources[0] is not sources:
+                self.sources = (sources, sources.to_array())
+            sources = self.sources[1]
+
+        if self.workers > 1:
+            values = self._evaluate_parallel(data, greens, sources, args, kwargs)
+        else:
+            values = self._evaluate_serial(data, greens, sources, args, kwargs)
+
+        total = None
+        kept = []
+
+        for _j, station_values in enumerate(values):
+            if total is None:
+                total = np.array(station_values)
+            else:
+                total += station_values
+
+            if self.keep:
+                kept += [self._keep(_j, station_values)]
+
+        self.values += [kept]
+
+        return total
+
+    def _evaluate_serial(self, data, greens, sources, args, kwargs):
+        for station in self.stations:
+            if self.verbose:
+                print(f'\n  {station.id}\n')
+
+            with self.report.phase('misfit_station',
+                data_type=self.label, station=station.id):
+                values = _evaluate_blocks(self.misfit,
+                    data.select(station), greens.select(station),
+                    sources, args, kwargs)
+
+            yield values
+
+    def _evaluate_parallel(self, data, greens, sources, args, kwargs):
+        filename, skeleton, layout = share(
+            (self.misfit, data, greens, sources, self.stations, args, kwargs))
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers,
+                initializer=_init_station_worker,
+                initargs=(filename, skeleton, layout)) as pool:
+
+                for station, (path, wall_time, cpu_time) in zip(self.stations,
+                    pool.map(_evaluate_station, range(len(self.stations)))):
+
+                    if self.verbose:
+                        print(f'\n  {station.id}\n')
+
+                    self.report.add('misfit_station', wall_time, cpu_time,
+                        data_type=self.label, station=station.id, worker=True)
+
+                    yield load_shared_array(path)
+        finally:
+            os.unlink(filename)
+
+    def _keep(self, _j, values):
+        if self.store is None:
+            return values
+
+        return self.store.write(self.label, len(self.values), _j,
+            [station.id for station in self.stations], values)
+
+    def surfaces(self, total):
+        """ Returns per-station surfaces with the same coords and dims as
+        the grid search result, or an empty list if surfaces were not kept
+        """
+        if not self.keep:
+            return []
+
+        if self.store is not None:
+            self.store.finalize(self.label, total)
+            return self.store.surfaces(self.label)
+
+        surfaces = []
+        for _j in range(len(self.stations)):
+            if issubclass(type(total), DataFrame):
+                # rows run over sources for one origin after another
+                values = np.concatenate([np.reshape(call[_j], -1)
+                    for call in self.values])
+            elif len(self.values) > 1:
+                values = np.concatenate([call[_j] for call in self.values], axis=-1)
+            else:
+                values = self.values[0][_j]
+
+            surfaces += [_like(total, values)]
+
+        return surfaces
+
+
+# per-process state of station workers
+_station_worker = {}
+
+
+def _init_station_worker(filename, skeleton, layout):
+    _station_worker['payload'] = attach(filename, skeleton, layout)
+
+
+def _evaluate_station(_j):
+    misfit, data, greens, sources, stations, args, kwargs =\
+        _station_worker['payload']
+
+    wall, cpu = perf_counter(), process_time()
+
+    station = stations[_j]
+    values = _evaluate_blocks(misfit, data.select(station),
+        greens.select(station), sources, args, kwargs)
+
+    return (shared_array(np.asarray(values)),
+        perf_counter() - wall, process_time() - cpu)
+
+
+def _evaluate_blocks(misfit, data, greens, sources, args, kwargs):
+    """ Evaluates misfit over a source array, or over a cached grid one
+    block at a time
+    """
+    values = [misfit(data, greens, block, *args, **kwargs)
+        for block in source_chunks(sources)()]
+
+    if len(values) == 1:
+        return values[0]
+    return np.concatenate(values)
+
+
 #
 # utility functions
 #
@@ -458,10 +1121,47 @@ def _save(filename, results):
         results.save(filename+'.h5')
 
 
+def _like(ds, values):
+    """ Returns values as a grid search result with the same coords and
+    dims, or the same row index, as `ds`
+    """
+    if issubclass(type(ds), DataFrame):
+        return MTUQDataFrame({ds.columns[0]: np.reshape(values, -1)},
+            index=ds.index)
+
+    return MTUQDataArray(**{
+        'data': np.reshape(values, ds.shape),
+        'coords': ds.coords,
+        'dims': ds.dims,
+        })
+
+
 def _write(filename, value):
     np.savetxt(filename, np.array([value]))
 
 
+def _write_depths(filename, labels, results_sum, origins):
+    """ Writes and prints the minimum misfit at each depth for each data type
+    """
+    minima = np.column_stack([_origin_minima(ds) for ds in results_sum])
+    depths = np.array([origin.depth_in_m for origin in origins])
+
+    np.savetxt(filename, np.column_stack([depths, minima]),
+        header='depth_in_m '+' '.join(labels))
+
+    print('\n  %10s  %s' % ('depth [m]', ''.join('%14s' % label for label in labels)))
+    for depth, values in zip(depths, minima):
+        print('  %10.0f  %s' % (depth, ''.join('%14.6e' % value for value in values)))
+    print('\n  best depth: %s\n' % ', '.join('%s %.0f m' % (label, depths[np.argmin(minima[:, _i])])
+        for _i, label in enumerate(labels)))
+
+
+def _origin_minima(ds):
+    if issubclass(type(ds), DataArray):
+        return ds.min(dim=[dim for dim in ds.dims if dim != 'origin_idx']).values
+    return ds.groupby(level='origin_idx').min().values.flatten()
+
+
 def progress(_i, _n):
     print('\nEVENT %d of %d\n' % (_i, _n))
 
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+
+import argparse
+import importlib.util
+import os
+import sys
+from os.path import abspath, basename, dirname, splitext
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='mtbench')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run',
+        help='run selected events from a scripts/run_*.py study script')
+    run.add_argument('script',
+        help='study script defining run_event(), names and selected_events')
+    run.add_argument('--workers', type=int, default=1,
+        help='number of worker processes')
+    run.add_argument('--logs', default='logs',
+        help='directory for per-event logs and summary.json')
+    run.add_argument('--events', nargs='+', default=None,
+        help='event ids to run, defaults to selected_events')
+    run.add_argument('--pipeline', action='store_true',
+        help='overlap loading, grid search and figures of consecutive events')
+    run.add_argument('--prefetch', type=int, default=1,
+        help='with --pipeline, events loaded ahead of the grid search')
+    run.add_argument('--figure-workers', type=int, default=2,
+        help='with --pipeline, processes plotting figures')
+    run.add_argument('--bulk-greens', action='store_true',
+        help="with --pipeline, extract each unique Green's tensor of the study once")
+    run.add_argument('--distance-resolution', type=float, default=None,
+        help='with --bulk-greens, meters within which distances count as '
+             'equal, defaults to 1000 for FK and 100 for syngine')
+
+    fetch = subparsers.add_parser('fetch',
+        help='install study waveforms from a git repository or local mirror')
+    fetch.add_argument('study', choices=['Silwal2016', 'Alvizuri2018'])
+    fetch.add_argument('--source', default=None,
+        help='git repository URL or path, or directory holding part files')
+    fetch.add_argument('--output', default=None,
+        help='waveform directory, defaults to WAVEFORMS/')
+    fetch.add_argument('--workers', type=int, default=4,
+        help='number of threads for checksums and file writes')
+    fetch.add_argument('--pack', action='store_true',
+        help='also pack each event into an .mtba archive')
+    fetch.add_argument('--no-verify', action='store_true',
+        help='install without checking parts against SHA256SUMS')
+
+    prefetch = subparsers.add_parser('prefetch',
+        help="download syngine Green's functions for a study ahead of running it")
+    prefetch.add_argument('script',
+        help='syngine study script, e.g. scripts/run_Silwal2016_syngine.py')
+    prefetch.add_argument('--events', nargs='+', default=None,
+        help='event ids to prefetch, defaults to selected_events')
+    prefetch.add_argument('--url', default=None,
+        help='syngine service URL, defaults to the IRIS web service')
+    prefetch.add_argument('--model', default='ak135')
+    prefetch.add_argument('--connections', type=int, default=8,
+        help='maximum number of concurrent requests')
+
+    pack = subparsers.add_parser('pack',
+        help="pack each event's SAC files into a single waveform archive")
+    pack.add_argument('study',
+        help='study waveform directory, e.g. WAVEFORMS/Silwal2016')
+    pack.add_argument('--pattern', default='*BH.[zrt]',
+        help='SAC files to pack within each event directory')
+    pack.add_argument('--output', default=None,
+        help='directory for <event>.mtba archives, defaults to the study directory')
+
+    benchmark = subparsers.add_parser('benchmark',
+        help='run benchmark suites')
+    benchmarks = benchmark.add_subparsers(dest='benchmark', required=True)
+
+    synthetic = benchmarks.add_parser('synthetic',
+        help='scaling benchmark on synthetic events, no downloads needed')
+    synthetic.add_argument('--stations', type=int, nargs='+',
+        help='station counts to sweep')
+    synthetic.add_argument('--grids', nargs='+',
+        help='grids to sweep, e.g. random:10000 sobol:8192 dc:20')
+    synthetic.add_argument('--windows', type=float, nargs='+',
+        help='window lengths in seconds to sweep')
+    synthetic.add_argument('--data-types', nargs='+',
+        help='data type combinations to sweep, e.g. rayleigh love rayleigh+love')
+    synthetic.add_argument('--output', default='.',
+        help='directory for synthetic_benchmark.csv')
+    synthetic.add_argument('--seed', type=int, default=0)
+
+    density = benchmarks.add_parser('density',
+        help='accuracy versus cost of grid density, against expected_results')
+    density.add_argument('script',
+        help='study script defining run_event(), names and expected_results')
+    density.add_argument('--grid', default='random',
+        choices=['random', 'sobol', 'halton', 'semiregular', 'dc'],
+        help='grid type to sweep')
+    density.add_argument('--densities', type=int, nargs='+', default=None,
+        help='grid points, or points per axis, to sweep')
+    density.add_argument('--tolerance', type=float, default=5.,
+        help='angular distance in degrees counted as converged')
+    density.add_argument('--events', nargs='+', default=None,
+        help='event ids to run, defaults to selected_events')
+    density.add_argument('--output', default='.',
+        help='directory for grid_density.csv, curves and per-run output')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        _run(args)
+
+    elif args.command == 'fetch':
+        _fetch(args)
+
+    elif args.command == 'prefetch':
+        _prefetch(args)
+
+    elif args.command == 'pack':
+        _pack(args)
+
+    elif args.command == 'benchmark' and args.benchmark == 'synthetic':
+        _benchmark_synthetic(args)
+
+    elif args.command == 'benchmark' and args.benchmark == 'density':
+        _benchmark_density(args)
+
+
+def _run(args):
+    from mtbench import run_pipeline, run_study
+
+    script = _import_script(args.script)
+
+    if args.events:
+        event_ids = args.events
+    else:
+        event_ids = [script.names[index] for index in script.selected_events]
+
+    if args.bulk_greens and not args.pipeline:
+        sys.exit('--bulk-greens requires --pipeline')
+
+    greens_plan = None
+    if args.bulk_greens:
+        from mtbench._density import _solver
+        from mtbench._plan import GreensPlan
+
+        greens_plan = GreensPlan(_solver(script), args.distance_resolution)
+        for stations, origins in _study_events(script, event_ids):
+            greens_plan.add(stations, origins)
+
+    if args.pipeline:
+        summaries = run_pipeline(script.run_event, event_ids,
+            prefetch=args.prefetch, figure_workers=args.figure_workers,
+            greens_plan=greens_plan, path_logs=args.logs)
+    else:
+        summaries = run_study(script.run_event, event_ids,
+            workers=args.workers, path_logs=args.logs)
+
+    if any(summary['status'] != 'ok' for summary in summaries):
+        sys.exit(1)
+
+
+def _fetch(args):
+    from mtbench._fetch import fetch, URL, WAVEFORMS
+
+    fetch(args.study,
+        source=args.source or URL,
+        path_waveforms=args.output or WAVEFORMS,
+        workers=args.workers,
+        pack_events=args.pack,
+        verify=not args.no_verify)
+
+
+def _prefetch(args):
+    from mtbench._syngine import prefetch_syngine, URL
+
+    script = _import_script(args.script)
+
+    if args.events:
+        event_ids = args.events
+    else:
+        event_ids = [script.names[index] for index in script.selected_events]
+
+    failed = prefetch_syngine(_study_events(script, event_ids),
+        url=args.url or URL, model=args.model, connections=args.connections)
+
+    if failed:
+        sys.exit(1)
+
+
+def _pack(args):
+    from mtbench._archive import pack_study
+
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    pack_study(args.study, pattern=args.pattern, path_output=args.output)
+
+
+def _benchmark_synthetic(args):
+    from mtbench._synthetic import run_synthetic_benchmark, SWEEPS
+
+    sweeps = dict(SWEEPS)
+    if args.stations:
+        sweeps['nstations'] = args.stations
+    if args.grids:
+        sweeps['grid'] = [_parse_grid(grid) for grid in args.grids]
+    if args.windows:
+        sweeps['window_length'] = args.windows
+    if args.data_types:
+        sweeps['data_types'] = [tuple(value.split('+')) for value in args.data_types]
+
+    run_synthetic_benchmark(sweeps, path_output=args.output, seed=args.seed)
+
+
+def _benchmark_density(args):
+    from mtbench._density import density_sweep
+
+    script = _import_script(args.script)
+
+    if args.events:
+        event_ids = args.events
+    else:
+        event_ids = [script.names[index] for index in script.selected_events]
+
+    density_sweep(script, event_ids, grid_type=args.grid,
+        densities=args.densities, tolerance=args.tolerance,
+        path_output=args.output)
+
+
+def _study_events(script, event_ids):
+    """ Returns (stations, origins) of each event, read from the data as
+    bench() reads them
+    """
+    from mtbench import _read_data, _get_origins
+
+    events = []
+    for event_id in event_ids:
+        depth = script.depths[script.names.index(event_id)]
+        data = _read_data(event_id,
+            script.fullpath(event_id, '*BH.[zrt]'),
+            script.fullpath(event_id, script.weight_file),
+            script.fullpath(event_id+'.mtba'))
+        events += [(data.get_stations(), _get_origins(data, [depth]))]
+    return events
+
+
+def _parse_grid(value):
+    grid_type, size = value.split(':')
+    return grid_type, int(size)
+
+
+def _import_script(filename):
+    """ Imports a study script as a module, so that its run_event() can be
+    pickled and sent to worker processes
+    """
+    path = dirname(abspath(filename))
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+    name = splitext(basename(filename))[0]
+    spec = importlib.util.spec_from_file_location(name, filename)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+if __name__=='__main__':
+    main()
+
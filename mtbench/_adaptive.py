@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+#
+# Coarse-to-fine search, as an alternative to exhaustive evaluation of a
+# fixed grid
+#
+
+import numpy as np
+import pandas
+
+from mtuq.grid import UnstructuredGrid
+from mtuq.grid_search import MTUQDataFrame
+
+from mtbench._math import to_mt
+
+
+# moment tensor grid dimensions and their bounds (Tape and Tape 2015);
+# kappa wraps around, the others are clipped
+DIMS = ('rho', 'v', 'w', 'kappa', 'sigma', 'h')
+
+BOUNDS = {
+    'v': (-1./3., +1./3.),
+    'w': (-3./8.*np.pi, +3./8.*np.pi),
+    'kappa': (0., 360.),
+    'sigma': (-90., +90.),
+    'h': (0., 1.),
+    }
+
+
+class AdaptiveSearch(object):
+    """ Evaluates a coarse grid, then repeatedly samples new points around the
+    lowest-misfit points found so far, shrinking the sampling box at each
+    level, until the best misfit stops improving
+
+    Each level is evaluated by `evaluate`, a function taking an
+    UnstructuredGrid and returning one MTUQDataFrame per data type. Results
+    from all levels are combined into a single UnstructuredGrid and one
+    MTUQDataFrame per data type, so they can be used wherever results of a
+    random grid search are
+
+    Points are ranked by misfit summed over data types, each scaled by its
+    entry in `weights`, which should match the weighted sum used to select
+    the best source from the results
+    """
+    def __init__(self, levels=6, keep=10, children=100, shrink=0.5,
+        tolerance=1.e-4, seed=0, weights=None, verbose=True):
+        self.levels = levels
+        self.keep = keep
+        self.children = children
+        self.shrink = shrink
+        self.tolerance = tolerance
+        self.seed = seed
+        self.weights = weights
+        self.verbose = verbose
+
+    def __call__(self, evaluate, grid):
+        rng = np.random.default_rng(self.seed)
+
+        points = _to_points(grid)
+        lower, upper, free = _bounds(points)
+
+        # initial box half-width is about the coarse grid spacing
+        nfree = max(np.sum(free), 1)
+        step = (upper - lower)/max(len(points), 1)**(1./nfree)
+
+        coords, results = [], []
+        best = np.inf
+
+        for level in range(self.levels+1):
+            level_grid = _to_grid(points)
+            level_results = evaluate(level_grid)
+
+            coords += [points]
+            results += [level_results]
+
+            objective = np.concatenate(
+                [_objective(_results, self.weights) for _results in results])
+            previous, best = best, objective.min()
+
+            if self.verbose:
+                print('  level %d: %d points, best misfit %.6e\n' % (
+                    level, len(points), best))
+
+            if level == self.levels:
+                break
+
+            if np.isfinite(previous) and previous - best <= self.tolerance*abs(previous):
+                break
+
+            parents = np.concatenate(coords)[
+                np.argsort(objective)[:self.keep]]
+
+            points = _refine(rng, parents, step, lower, upper, free,
+                self.children)
+            step *= self.shrink
+
+        union = _to_grid(np.concatenate(coords))
+
+        # one frame per data type, rows in the same order as the union grid;
+        # source indices of each level are offset by the size of the levels
+        # before it
+        offsets = np.cumsum([0] + [len(points) for points in coords[:-1]])
+
+        results_sum = []
+        for _i in range(len(results[0])):
+            results_sum += [MTUQDataFrame(pandas.concat(
+                [_offset(_results[_i], offset)
+                for _results, offset in zip(results, offsets)]))]
+
+        return union, results_sum
+
+
+def _to_points(grid):
+    """ Returns grid points as an (npts, 6) array
+    """
+    if tuple(grid.dims) != DIMS:
+        raise ValueError('Adaptive search requires a moment tensor grid')
+
+    frame = grid.to_dataframe()
+    return np.column_stack([np.asarray(frame[dim], dtype=float) for dim in DIMS])
+
+
+def _to_grid(points):
+    return UnstructuredGrid(
+        dims=DIMS,
+        coords=[points[:, _k] for _k in range(len(DIMS))],
+        callback=to_mt)
+
+
+def _bounds(points):
+    """ Returns lower and upper bounds and which dimensions vary; dimensions
+    that are constant on the coarse grid, e.g. v and w of a double couple
+    grid, stay fixed
+    """
+    lower = np.array([BOUNDS[dim][0] if dim in BOUNDS else points[:, _k].min()
+        for _k, dim in enumerate(DIMS)])
+    upper = np.array([BOUNDS[dim][1] if dim in BOUNDS else points[:, _k].max()
+        for _k, dim in enumerate(DIMS)])
+    free = points.max(axis=0) > points.min(axis=0)
+    return lower, upper, free
+
+
+def _refine(rng, parents, step, lower, upper, free, children):
+    """ Samples points uniformly within a box about each parent
+    """
+    points = np.repeat(parents, children, axis=0)
+    offsets = rng.uniform(-1., 1., size=points.shape)*step
+    points[:, free] += offsets[:, free]
+
+    kappa = DIMS.index('kappa')
+    points[:, kappa] %= 360.
+
+    return np.clip(points, lower, upper)
+
+
+def _offset(frame, offset):
+    """ Returns a copy of a grid_search result with source indices shifted
+    """
+    index = frame.index.to_frame(index=False)
+    if 'source_idx' not in index:
+        return frame
+
+    index['source_idx'] += offset
+    frame = frame.copy()
+    frame.index = pandas.MultiIndex.from_frame(index)
+    return frame
+
+
+def _objective(results, weights=None):
+    """ Sums misfit over data types, optionally weighted
+    """
+    if weights is None:
+        weights = [1. for _ in results]
+    return np.sum([weight*np.asarray(ds.values).flatten()
+        for weight, ds in zip(weights, results)], axis=0)
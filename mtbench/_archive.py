@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+#
+# Packed waveform archives
+#
+# All SAC files of an event go into a single file: a JSON header table with
+# trace and SAC header metadata, followed by the trace samples. Reading maps
+# the file into memory, so traces are views rather than copies
+#
+# The table also records the name, size and modification time of each
+# packed SAC file, so an archive older than its sources can be detected
+#
+
+import json
+import os
+import struct
+import numpy as np
+from glob import glob
+from os.path import basename, isdir, join
+
+import obspy
+from obspy import Stream, Trace, UTCDateTime
+from mtuq.dataset import Dataset
+from mtuq.io.readers.SAC import _get_origin, _get_station
+
+from mtbench._cache import file_signature
+
+
+MAGIC = b'MTBA'
+VERSION = 1
+SUFFIX = '.mtba'
+
+# samples of each trace start on an aligned offset
+ALIGNMENT = 64
+
+
+def pack(path_data, filename):
+    """ Packs the SAC files matching `path_data` into an archive
+    """
+    traces, header = [], []
+    offset = 0
+
+    for path in sorted(glob(path_data)):
+        for trace in obspy.read(path, format='sac'):
+            data = np.ascontiguousarray(trace.data)
+
+            header += [{
+                'network': trace.stats.network,
+                'station': trace.stats.station,
+                'location': trace.stats.location,
+                'channel': trace.stats.channel,
+                'starttime': trace.stats.starttime.ns,
+                'delta': trace.stats.delta,
+                'calib': trace.stats.calib,
+                'npts': len(data),
+                'dtype': data.dtype.str,
+                'offset': offset,
+                'sac': {key: _to_json(value)
+                    for key, value in trace.stats.get('sac', {}).items()},
+                }]
+
+            traces += [data]
+            offset = _align(offset + data.nbytes)
+
+    if not traces:
+        raise FileNotFoundError('No SAC files match %s' % path_data)
+
+    table = json.dumps({'version': VERSION, 'traces': header,
+        'sources': file_signature(path_data)}).encode('utf-8')
+    start = _align(len(MAGIC) + 8 + len(table))
+
+    staging = filename+'.tmp%d' % os.getpid()
+    with open(staging, 'wb') as file:
+        file.write(MAGIC)
+        file.write(struct.pack('<Q', len(table)))
+        file.write(table)
+
+        for entry, data in zip(header, traces):
+            file.seek(start + entry['offset'])
+            file.write(data.tobytes())
+
+    os.replace(staging, filename)
+    return filename
+
+
+def pack_study(path_study, pattern='*BH.[zrt]', path_output=None, verbose=True):
+    """ Packs each event directory of a study, e.g. WAVEFORMS/Silwal2016,
+    into <event>.mtba alongside it, or in `path_output`
+    """
+    filenames = []
+    for dirname in sorted(glob(join(path_study, '*'))):
+        if not isdir(dirname):
+            continue
+
+        filename = join(path_output or path_study, basename(dirname)+SUFFIX)
+        pack(join(dirname, pattern), filename)
+        filenames += [filename]
+
+        if verbose:
+            print('  %s  (%.1f MB)' % (filename, os.path.getsize(filename)/2.**20))
+
+    return filenames
+
+
+def is_current(filename, path_data):
+    """ Whether an archive was packed from the SAC files now matching
+    `path_data`, by name, size and modification time
+
+    An archive is current if no SAC files match, e.g. where only archives
+    were installed, and out of date if it records no sources
+    """
+    sources = file_signature(path_data)
+    if not sources:
+        return True
+
+    table, _ = _read_table(filename)
+    if 'sources' not in table:
+        return False
+
+    return [list(source) for source in table['sources']] ==\
+        [list(source) for source in sources]
+
+
+def read_archive(filename, event_id=None, station_id_list=None, tags=[]):
+    """ Reads an archive written by ``pack``, returning the same Dataset as
+    mtuq's SAC reader returns for the original files
+
+    Trace data are copy-on-write views of a memory map of the archive
+    """
+    table, start = _read_table(filename)
+    buffer = np.memmap(filename, dtype=np.uint8, mode='c')
+
+    # group traces by station, as mtuq's SAC reader does
+    streams = {}
+    for entry in table['traces']:
+        first = start + entry['offset']
+        last = first + entry['npts']*np.dtype(entry['dtype']).itemsize
+        data = buffer[first:last].view(entry['dtype'])
+
+        trace = Trace(data=data, header={
+            'network': entry['network'],
+            'station': entry['station'],
+            'location': entry['location'],
+            'channel': entry['channel'],
+            'starttime': UTCDateTime(ns=entry['starttime']),
+            'delta': entry['delta'],
+            'calib': entry['calib'],
+            })
+        trace.stats._format = 'SAC'
+        trace.stats.sac = obspy.core.AttribDict(
+            {key: _from_json(value) for key, value in entry['sac'].items()})
+
+        id = '.'.join((entry['network'], entry['station'], entry['location']))
+        streams.setdefault(id, Stream()).append(trace)
+
+    if station_id_list is not None:
+        streams = {id: stream for id, stream in streams.items()
+            if id in station_id_list}
+
+    streams = list(streams.values())
+    tags = list(tags)
+
+    origin = _get_origin(streams[0], event_id)
+    for stream in streams:
+        stream.origin = origin
+        tags += ['origin_type:preliminary']
+
+    for stream in streams:
+        stream.station = _get_station(stream, origin)
+
+    return Dataset(streams, id=event_id, tags=tags)
+
+
+def _read_table(filename):
+    """ Returns the header table of an archive and the offset of its samples
+    """
+    with open(filename, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError('Not a waveform archive: %s' % filename)
+        size, = struct.unpack('<Q', file.read(8))
+        table = json.loads(file.read(size).decode('utf-8'))
+
+    if table['version'] != VERSION:
+        raise ValueError('Unsupported archive version: %s' % table['version'])
+
+    return table, _align(len(MAGIC) + 8 + size)
+
+
+def _align(offset):
+    return -(-offset//ALIGNMENT)*ALIGNMENT
+
+
+def _to_json(value):
+    # keeps numpy scalar types, e.g. float32 SAC header fields, so values
+    # read back are identical
+    if isinstance(value, np.generic):
+        return [value.dtype.str, value.item()]
+    return value
+
+
+def _from_json(value):
+    if isinstance(value, list):
+        return np.dtype(value[0]).type(value[1])
+    return value
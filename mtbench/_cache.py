@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import numpy as np
+import pandas
+from glob import glob
+from os.path import basename, exists, getmtime, getsize, isfile, join
+
+from mtuq.grid_search import DataFrame, MTUQDataArray, MTUQDataFrame
+
+
+def cache_key(*args, **kwargs):
+    """ Returns a hex digest identifying the given inputs
+    """
+    digest = hashlib.sha1()
+    _update(digest, (args, kwargs))
+    return digest.hexdigest()
+
+
+def file_signature(pattern):
+    """ Identifies files by name, size and modification time, which is much
+    cheaper than hashing waveform contents
+    """
+    return [(basename(filename), getsize(filename), getmtime(filename))
+        for filename in sorted(glob(pattern))]
+
+
+def file_hash(filename):
+    """ Identifies a (small) file by its contents
+    """
+    if not isfile(filename):
+        return None
+    with open(filename, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def _update(digest, value, depth=0):
+    """ Feeds a canonical representation of `value` to `digest`
+
+    Objects are hashed through their constructor parameters, read back from
+    attributes of the same name, so that for example two ProcessData
+    instances with identical parameters hash the same. If the constructor
+    takes keyword arguments, public attributes holding plain values are
+    hashed as well. State built from the parameters, such as a TauPyModel
+    loaded for travel time picks, is not hashed
+    """
+    if depth > 8:
+        raise ValueError('Too deeply nested to hash')
+
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        digest.update(repr((type(value).__name__, value)).encode())
+
+    elif isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            # would hash pointers, which differ between processes
+            raise ValueError('Cannot hash arrays of Python objects')
+        digest.update(repr(('ndarray', value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+
+    elif isinstance(value, np.generic):
+        _update(digest, value.item(), depth+1)
+
+    elif isinstance(value, (list, tuple)):
+        digest.update(repr((type(value).__name__, len(value))).encode())
+        for item in value:
+            _update(digest, item, depth+1)
+
+    elif isinstance(value, dict):
+        digest.update(repr(('dict', len(value))).encode())
+        for key in sorted(value, key=repr):
+            _update(digest, key, depth+1)
+            _update(digest, value[key], depth+1)
+
+    elif hasattr(value, '__qualname__'):
+        # functions, methods and classes
+        digest.update(repr(('callable', getattr(value, '__module__', None),
+            getattr(value, '__qualname__', repr(value)))).encode())
+
+    elif hasattr(value, '__dict__'):
+        digest.update(repr(('object', type(value).__module__,
+            type(value).__qualname__)).encode())
+        _update(digest, _parameters(value), depth+1)
+
+    else:
+        digest.update(repr(value).encode())
+
+
+def _parameters(value):
+    """ Returns the constructor parameters of an object as a dictionary
+    """
+    try:
+        signature = inspect.signature(type(value).__init__)
+    except (TypeError, ValueError):
+        signature = None
+
+    names, keywords = [], signature is None
+    for name, parameter in (signature.parameters.items() if signature else []):
+        if parameter.kind == parameter.VAR_KEYWORD:
+            keywords = True
+        elif name != 'self' and parameter.kind != parameter.VAR_POSITIONAL:
+            names += [name]
+
+    attributes = vars(value)
+    parameters = {name: attributes[name] for name in names
+        if name in attributes}
+
+    if keywords:
+        parameters.update({name: item for name, item in attributes.items()
+            if not name.startswith('_') and name not in parameters
+            and _plain(item)})
+
+    return parameters
+
+
+def _plain(value):
+    """ Whether a value is configuration rather than derived state
+    """
+    if value is None or isinstance(value, (bool, int, float, complex, str,
+        bytes, np.generic)):
+        return True
+    if isinstance(value, np.ndarray):
+        return not value.dtype.hasobject
+    if isinstance(value, (list, tuple)):
+        return all(_plain(item) for item in value)
+    if isinstance(value, dict):
+        return all(_plain(key) and _plain(item) for key, item in value.items())
+    return hasattr(value, '__qualname__')
+
+
+class ResultCache(object):
+    """ Persistent cache of bench() misfit results, keyed by a hash of all
+    inputs that affect them
+
+    Each entry holds the misfit surfaces, norms, standard deviations and
+    station metadata needed to go straight to figure generation, plus a
+    StationStore with per-station surfaces
+    """
+    def __init__(self, path_cache, key):
+        self.dirname = join(path_cache, key)
+        self.staging = self.dirname+'.tmp'
+
+    def load(self, need_sigma=False, need_norms=False, need_stations=False):
+        """ Returns cached results, or None if there is no usable entry
+        """
+        if not exists(join(self.dirname, 'results.pkl')):
+            return None
+
+        with open(join(self.dirname, 'results.pkl'), 'rb') as file:
+            results = pickle.load(file)
+
+        if need_sigma and results['devs'] is None:
+            return None
+        if need_norms and results['norms'] is None:
+            return None
+        if need_stations and not exists(join(self.dirname, 'station_store')):
+            return None
+
+        results['results_sum'] = [_load_dataarray(self.dirname, 'results_%d' % _i)
+            for _i in range(results.pop('nresults'))]
+
+        return results
+
+    def start(self):
+        """ Prepares a staging directory for a new entry
+        """
+        shutil.rmtree(self.staging, ignore_errors=True)
+        os.makedirs(self.staging)
+
+    def save(self, results_sum, **results):
+        """ Saves results and atomically moves the staged entry into place
+        """
+        for _i, ds in enumerate(results_sum):
+            _save_dataarray(self.staging, 'results_%d' % _i, ds)
+
+        results['nresults'] = len(results_sum)
+
+        with open(join(self.staging, 'results.pkl'), 'wb') as file:
+            pickle.dump(results, file)
+
+        shutil.rmtree(self.dirname, ignore_errors=True)
+        os.replace(self.staging, self.dirname)
+
+
+def _save_dataarray(dirname, name, ds):
+    # results on unstructured grids are DataFrames
+    if issubclass(type(ds), DataFrame):
+        ds.to_pickle(join(dirname, name+'.pkl'))
+        return
+
+    np.save(join(dirname, name+'.npy'), ds.values)
+
+    np.savez(join(dirname, name+'_coords.npz'),
+        **{dim: np.asarray(ds.coords[dim]) for dim in ds.dims
+            if dim in ds.coords})
+
+    with open(join(dirname, name+'_dims.json'), 'w') as file:
+        json.dump(list(ds.dims), file)
+
+
+def _load_dataarray(dirname, name):
+    if exists(join(dirname, name+'.pkl')):
+        return MTUQDataFrame(pandas.read_pickle(join(dirname, name+'.pkl')))
+
+    with open(join(dirname, name+'_dims.json')) as file:
+        dims = json.load(file)
+
+    with np.load(join(dirname, name+'_coords.npz')) as coords:
+        coords = {dim: coords[dim] for dim in coords.files}
+
+    return MTUQDataArray(**{
+        'data': np.load(join(dirname, name+'.npy')),
+        'coords': coords,
+        'dims': dims,
+        })
+
+
+class GreensCache(object):
+    """ On-disk cache of convolved and processed Green's tensors
+
+    Each station's tensor is stored in its own file, keyed by solver, model,
+    database, source-time function, processing parameters, station and
+    origin, so repeat runs skip both database reads and filtering
+    """
+    def __init__(self, path_cache, solver, model, path_greens,
+        include_mt, include_force, stf, process_data):
+        self.dirname = join(path_cache, 'greens')
+        self.prefix = cache_key(solver, model, path_greens,
+            include_mt, include_force, stf, process_data)
+
+    def load(self, stations, origin):
+        """ Returns a list with a cached tensor or None for each station
+        """
+        tensors = []
+        for station in stations:
+            filename = self._filename(station, origin)
+            if exists(filename):
+                with open(filename, 'rb') as file:
+                    tensors += [pickle.load(file)]
+            else:
+                tensors += [None]
+        return tensors
+
+    def save(self, tensors, origin):
+        os.makedirs(self.dirname, exist_ok=True)
+        for tensor in tensors:
+            filename = self._filename(tensor.station, origin)
+            with open(filename+'.tmp', 'wb') as file:
+                pickle.dump(tensor, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(filename+'.tmp', filename)
+
+    def _filename(self, station, origin):
+        return join(self.dirname, cache_key(self.prefix,
+            station.id, station.latitude, station.longitude,
+            str(origin.time), origin.latitude, origin.longitude,
+            origin.depth_in_m)+'.pkl')
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import threading
+from time import perf_counter
+
+from mtuq import open_db
+
+
+class DatabasePool(object):
+    """ Opens each Green's function database once and keeps it open for a
+    whole study, so that file handles and in-memory indexes of AxiSEM,
+    SPECFEM3D and FK databases are built only once
+
+    Databases are keyed by solver, model, path and included source types.
+    Each reuse is counted as saving the time the first open took
+    """
+    def __init__(self):
+        self.databases = {}
+        self.open_time = {}
+        self.reused = {}
+        self.lock = threading.Lock()
+
+    def open(self, path_greens, solver, model, include_mt=True,
+        include_force=False):
+        """ Returns an open database, opening it on first use
+        """
+        key = (solver, model, path_greens, include_mt, include_force)
+
+        with self.lock:
+            if key in self.databases:
+                self.reused[key] += 1
+                return self.databases[key]
+
+            start = perf_counter()
+            self.databases[key] = open_db(path_greens, format=solver,
+                model=model, include_mt=include_mt, include_force=include_force)
+            self.open_time[key] = perf_counter() - start
+            self.reused[key] = 0
+
+            return self.databases[key]
+
+    def saved(self):
+        """ Returns the estimated time saved by reusing open databases
+        """
+        return sum(self.open_time[key]*self.reused[key] for key in self.databases)
+
+    def summary(self):
+        """ Prints open time and reuse count of each database
+        """
+        if not self.databases:
+            return
+
+        print("\n  Green's function databases:")
+        for key in self.databases:
+            print('    %-10s %-10s %8.2f s  reused %d times  %s' % (
+                key[0], key[1], self.open_time[key], self.reused[key], key[2]))
+        print('    saved ~%.2f s\n' % self.saved())
+
+    def close(self):
+        with self.lock:
+            self.databases.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+#
+# Decimation of processed waveforms
+#
+# After band-pass filtering, traces are still stored at the broadband sample
+# rate of the original data. Decimating to a rate set by the upper filter
+# corner reduces the cost of every misfit correlation accordingly
+#
+
+import numpy as np
+from scipy.signal import decimate
+
+
+# decimation factors applied in a single FIR stage are kept small, as
+# recommended by scipy
+MAX_STAGE = 10
+
+# each stage is a Hamming-windowed FIR of FIR_ORDER*q+1 taps cut off at the
+# new Nyquist frequency, longer than scipy's default of 20*q+1. Its
+# transition band is about 3.3/(30*q) of the old sample rate wide, i.e.
+# +-11% of the new Nyquist frequency about the cutoff, so the passband is
+# flat to within 1% up to 0.89 and aliases fold no lower than 0.89 of the
+# new Nyquist frequency, where scipy's default would give 0.83. At least
+# 2.5 samples per period of the upper corner put the corner at 0.8 of the
+# new Nyquist frequency or below, inside the passband
+FIR_ORDER = 30
+
+MIN_OVERSAMPLING = 2.5
+
+
+class Decimate(object):
+    """ Wraps a ProcessData instance, decimating its output to about
+    `oversampling` samples per period of the upper filter corner
+
+    Decimation uses zero-phase FIR anti-alias filtering, so arrival times are
+    unchanged. Data and Green's tensors processed by the same wrapper share
+    the same sample rate. Attributes of the wrapped instance, e.g. window
+    parameters used in plotting, are passed through
+
+    `freq_max` overrides the upper corner read from the wrapped instance
+    """
+    def __init__(self, process_data, oversampling=10., freq_max=None):
+        if oversampling < MIN_OVERSAMPLING:
+            raise ValueError('oversampling must be at least %.1f' % MIN_OVERSAMPLING)
+
+        self.process_data = process_data
+        self.oversampling = oversampling
+        self.freq_max = freq_max or _freq_max(process_data)
+
+    def __getattr__(self, name):
+        # guards against recursion while unpickling, before process_data is
+        # set
+        if name.startswith('__') or name == 'process_data':
+            raise AttributeError(name)
+        return getattr(self.process_data, name)
+
+    def __call__(self, traces, *args, **kwargs):
+        traces = self.process_data(traces, *args, **kwargs)
+
+        if not self.freq_max or not len(traces):
+            return traces
+
+        stages = _stages(int(
+            1./(self.oversampling*self.freq_max*traces[0].stats.delta)))
+        if not stages:
+            return traces
+
+        factor = int(np.prod(stages))
+        for trace in traces:
+            for stage in stages:
+                trace.data = decimate(trace.data, stage, n=FIR_ORDER*stage,
+                    ftype='fir', zero_phase=True)
+            trace.data = np.ascontiguousarray(trace.data)
+            trace.stats.delta *= factor
+
+        if hasattr(traces, 'include_mt'):
+            # Green's tensors precompute arrays from their traces
+            return type(traces)(traces=list(traces), station=traces.station,
+                origin=traces.origin, id=traces.id, tags=list(traces.tags),
+                include_mt=traces.include_mt, include_force=traces.include_force)
+
+        return traces
+
+
+def decimated(process_data, oversampling=10.):
+    """ Returns `process_data` wrapped in Decimate, unless already wrapped
+    """
+    if isinstance(process_data, Decimate):
+        return process_data
+    return Decimate(process_data, oversampling)
+
+
+def _freq_max(process_data):
+    """ Returns the upper corner of a band-pass or low-pass filter, or None
+    """
+    filter_type = getattr(process_data, 'filter_type', None) or ''
+    if filter_type.lower() not in ('bandpass', 'lowpass'):
+        return None
+
+    if getattr(process_data, 'freq_max', None):
+        return process_data.freq_max
+    if getattr(process_data, 'period_min', None):
+        return 1./process_data.period_min
+    return None
+
+
+def _stages(factor):
+    """ Splits a decimation factor into stages of at most MAX_STAGE, rounding
+    down where the factor has a larger prime divisor
+    """
+    stages = []
+    while factor > 1:
+        for stage in range(min(factor, MAX_STAGE), 1, -1):
+            if factor % stage == 0:
+                break
+        else:
+            factor -= 1
+            continue
+        stages += [stage]
+        factor //= stage
+    return stages
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+
+#
+# Accuracy versus cost of grid density, measured against published solutions
+#
+
+import csv
+import json
+import os
+from os.path import join
+from time import perf_counter
+
+from mtuq.grid import DoubleCoupleGridRegular, FullMomentTensorGridRandom,\
+    FullMomentTensorGridSemiregular
+
+from mtbench._grid import FullMomentTensorGridQuasiRandom
+from mtbench._math import angular_distance, from_expected, to_mt
+
+
+# densities swept by default for each grid type, in increasing order
+DENSITIES = {
+    'random': [1000, 5000, 20000, 100000, 500000],
+    'sobol': [1024, 4096, 16384, 65536, 262144],
+    'halton': [1000, 5000, 20000, 100000, 500000],
+    'semiregular': [5, 10, 15, 20, 25],
+    'dc': [5, 10, 20, 30, 40],
+    }
+
+
+def density_grid(grid_type, density, magnitude):
+    """ Returns a full moment tensor random grid ('random', `density` points),
+    a full moment tensor quasi-random grid ('sobol' or 'halton', `density`
+    points), a full moment tensor semiregular grid ('semiregular', `density`
+    points per axis) or a regular double couple grid ('dc', `density` points
+    per axis)
+    """
+    if grid_type == 'random':
+        return FullMomentTensorGridRandom(npts=density, magnitudes=[magnitude])
+    elif grid_type in ('sobol', 'halton'):
+        return FullMomentTensorGridQuasiRandom(npts=density,
+            magnitudes=[magnitude], sequence=grid_type)
+    elif grid_type == 'semiregular':
+        return FullMomentTensorGridSemiregular(npts_per_axis=density,
+            magnitudes=[magnitude])
+    elif grid_type == 'dc':
+        return DoubleCoupleGridRegular(npts_per_axis=density,
+            magnitudes=[magnitude])
+    else:
+        raise ValueError('Unknown grid type: %s' % grid_type)
+
+
+def density_sweep(script, event_ids, grid_type='random', densities=None,
+    tolerance=5., path_output='.'):
+    """ Reruns each event at increasing grid densities, measuring misfit
+    evaluation cost and the angular distance of the best source from the
+    script's ``expected_results``
+
+    Writes one row per event and density to grid_density.csv and a
+    cost/accuracy curve per event, and returns the smallest density that
+    converged within `tolerance` degrees for each event
+    """
+    if script.expected_results is None:
+        raise ValueError('Study script has no expected_results')
+
+    if densities is None:
+        densities = DENSITIES[grid_type]
+    densities = sorted(densities)
+
+    solver = _solver(script)
+    os.makedirs(path_output, exist_ok=True)
+
+    rows, converged = [], {}
+
+    for event_id in event_ids:
+        index = script.names.index(event_id)
+        expected_mt = from_expected(script.expected_results[index])
+
+        for density in densities:
+            grid = density_grid(grid_type, density, script.magnitudes[index])
+            path_run = join(path_output, '%s_%s_%s_%d' % (
+                event_id, solver, grid_type, density))
+            os.makedirs(path_run, exist_ok=True)
+
+            print('\n%s  %s grid, density %d (%d points)\n' % (
+                event_id, grid_type, density, grid.size))
+
+            start = perf_counter()
+            source_dict = script.run_event(event_id, grid=grid,
+                path_output=path_run, **_OPTIONS)
+            total_time = perf_counter() - start
+
+            with open(join(path_run, event_id+'_report.json')) as file:
+                summary = json.load(file)['summary']
+
+            rows += [{
+                'event_id': event_id,
+                'solver': solver,
+                'grid': grid_type,
+                'density': density,
+                'grid_size': grid.size,
+                'misfit_time': summary['misfit']['wall_time'],
+                'total_time': total_time,
+                'angular_error': float(angular_distance(
+                    _to_mt(source_dict), expected_mt)),
+                }]
+            _print_row(rows[-1], header=len(rows)==1)
+
+        converged[event_id] = _converged(
+            [row for row in rows if row['event_id']==event_id], tolerance)
+
+        _plot_curve(join(path_output, '%s_%s_%s_density.png' % (
+            event_id, solver, grid_type)),
+            [row for row in rows if row['event_id']==event_id], tolerance)
+
+    filename = join(path_output, 'grid_density.csv')
+    with open(filename, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print('\nsmallest %s grid within %.1f degrees:' % (grid_type, tolerance))
+    for event_id, row in converged.items():
+        if row is None:
+            print('  %-16s  not converged' % event_id)
+        else:
+            print('  %-16s  density %d (%d points)' % (
+                event_id, row['density'], row['grid_size']))
+
+    print('\nwrote %s\n' % filename)
+    return converged
+
+
+# bench() options for sweep runs; figures and per-station surfaces are not
+# needed and would dominate the cost of small grids
+_OPTIONS = {
+    'plot_beachball': False,
+    'plot_waveforms': False,
+    'lune_misfit': False,
+    'lune_variance_reduction': False,
+    'vw_misfit': False,
+    'dc_misfit': False,
+    'station_contributions': False,
+    'save_misfit': False,
+    }
+
+
+def _converged(rows, tolerance):
+    """ Returns the smallest density whose error, and the error of every
+    denser grid, is within tolerance
+    """
+    result = None
+    for row in reversed(rows):
+        if row['angular_error'] > tolerance:
+            break
+        result = row
+    return result
+
+
+def _to_mt(source_dict):
+    # double couple grids omit lune coordinates
+    return to_mt(source_dict['rho'], source_dict.get('v', 0.),
+        source_dict.get('w', 0.), source_dict['kappa'], source_dict['sigma'],
+        source_dict['h'])
+
+
+def _solver(script):
+    # e.g. run_Alvizuri2018_FK -> FK
+    return script.__name__.split('_')[-1]
+
+
+def _plot_curve(filename, rows, tolerance):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as pyplot
+
+    figure, axis = pyplot.subplots(figsize=(6., 4.))
+    axis.semilogx([row['misfit_time'] for row in rows],
+        [row['angular_error'] for row in rows], 'o-')
+    for row in rows:
+        axis.annotate('%d' % row['grid_size'],
+            (row['misfit_time'], row['angular_error']),
+            textcoords='offset points', xytext=(4, 4), fontsize=8)
+    axis.axhline(tolerance, color='gray', linestyle='--')
+    axis.set_xlabel('misfit evaluation time [s]')
+    axis.set_ylabel('angular distance from expected [deg]')
+    axis.set_title('%s  %s  %s' % (rows[0]['event_id'], rows[0]['solver'],
+        rows[0]['grid']))
+    figure.tight_layout()
+    figure.savefig(filename)
+    pyplot.close(figure)
+
+
+def _print_row(row, header=False):
+    if header:
+        print('%-16s %-10s %-12s %8s %9s %10s %10s' % (
+            'event', 'solver', 'grid', 'density', 'npts', 'misfit [s]',
+            'err [deg]'))
+    print('%-16s %-10s %-12s %8d %9d %10.2f %10.2f' % (
+        row['event_id'], row['solver'], row['grid'], row['density'],
+        row['grid_size'], row['misfit_time'], row['angular_error']))
@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+
+#
+# Installs study waveforms from the mtbench data branches, or from a local
+# mirror of them
+#
+
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+from os.path import abspath, basename, dirname, exists, isdir, join, normpath
+
+from mtbench._archive import pack, SUFFIX
+
+
+# remote repository holding one data branch per study
+URL = 'https://github.com/rmodrak/mtbench.git'
+
+BRANCHES = {
+    'Silwal2016': 'WaveformsSilwal2016',
+    'Alvizuri2018': 'WaveformsAlvizuri2018',
+    }
+
+# default install location, alongside download.bash
+WAVEFORMS = abspath(join(dirname(__file__), '..', 'WAVEFORMS'))
+
+# optional checksum file within a data branch, in sha256sum format. The
+# checksums parts were installed with are kept under the same name in the
+# study directory
+CHECKSUMS = 'SHA256SUMS'
+
+# written into each event directory once all its files are extracted
+MARKER = '.installed'
+
+# written into the study directory once the whole archive is extracted,
+# listing its events
+COMPLETE = '.complete'
+
+
+def fetch(study, source=URL, path_waveforms=WAVEFORMS, workers=4,
+    pack_events=False, pattern='*BH.[zrt]', verify=True, verbose=True):
+    """ Installs waveforms for a study into <path_waveforms>/<study>
+
+    `source` is a git repository URL or path with a branch per study, or a
+    local directory holding the split archive ("part?" files) of the study,
+    either directly or in a subdirectory named after the study or its branch
+
+    Unless `verify` is False, parts are checked against the source's
+    SHA256SUMS or, for sources without one, such as the data branches,
+    against checksums recorded on first install. They are then streamed
+    through a single decompressor while files are written by a pool of
+    threads. Events already installed are skipped, and with `pack_events`
+    each event is also packed into an .mtba archive as soon as it is
+    extracted
+    """
+    if study not in BRANCHES:
+        raise ValueError('Unknown study: %s' % study)
+
+    path_study = join(path_waveforms, study)
+    installed = installed_events(path_study)
+
+    # events of the study, from the study module or an earlier install
+    names = _names(study) or _completed(path_study)
+    if names and all(name in installed for name in names):
+        if verbose:
+            print('%s: all %d events already installed\n' % (study, len(names)))
+        return []
+
+    staging = None
+    try:
+        path_parts = _find_parts(source, study)
+        if path_parts is None:
+            staging = tempfile.mkdtemp(prefix='mtbench_fetch_')
+            path_parts = _clone(source, BRANCHES[study], staging, verbose)
+
+        parts = sorted(glob(join(path_parts, 'part?')))
+        if not parts:
+            raise FileNotFoundError('No parts found in %s' % path_parts)
+
+        if verify:
+            _verify(path_parts, parts, path_study, workers, verbose)
+        elif verbose:
+            print('  skipping verification\n')
+
+        return _extract(parts, study, path_study, installed, workers,
+            pack_events, pattern, verbose)
+
+    finally:
+        if staging:
+            shutil.rmtree(staging, ignore_errors=True)
+
+
+def installed_events(path_study):
+    """ Returns names of events whose extraction completed
+    """
+    return {basename(dirname(filename))
+        for filename in glob(join(path_study, '*', MARKER))}
+
+
+def _names(study):
+    # event names from the study module, if available, so that fully
+    # installed studies need no download at all
+    try:
+        if study == 'Silwal2016':
+            from mtbench._Silwal2016 import names
+        else:
+            from mtbench._Alvizuri2018 import names
+        return names
+    except ImportError:
+        return None
+
+
+def _completed(path_study):
+    """ Returns events listed by a completed install, or None
+    """
+    if not exists(join(path_study, COMPLETE)):
+        return None
+    with open(join(path_study, COMPLETE)) as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def _find_parts(source, study):
+    if not isdir(source) or isdir(join(source, '.git')):
+        return None
+
+    for path in (source, join(source, study), join(source, BRANCHES[study])):
+        if glob(join(path, 'part?')):
+            return path
+
+    return None
+
+
+def _clone(source, branch, staging, verbose):
+    if verbose:
+        print('Cloning %s (%s)...\n' % (source, branch))
+
+    path = join(staging, branch)
+    subprocess.run(['git', 'clone', '--depth', '1', '--branch', branch,
+        source, path], check=True)
+    return path
+
+
+def _verify(path_parts, parts, path_study, workers, verbose=True):
+    """ Checks parts against the source's checksum file or, failing that,
+    against checksums recorded by an earlier install, hashing them
+    concurrently
+
+    Checksums of verified parts are recorded in the study directory. If
+    neither source nor study directory has any, the parts are trusted and
+    their checksums recorded for later fetches
+    """
+    recorded = join(path_study, CHECKSUMS)
+
+    expected = None
+    for filename in (join(path_parts, CHECKSUMS), recorded):
+        if exists(filename):
+            expected = _read_checksums(filename)
+            break
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = list(pool.map(_sha256, parts))
+
+    if expected is None:
+        print('  warning: no %s in source or earlier install; recording '
+            'checksums to verify later fetches against\n' % CHECKSUMS)
+
+    else:
+        for part, digest in zip(parts, digests):
+            name = basename(part)
+            if name not in expected:
+                raise ValueError('%s not listed in %s' % (name, CHECKSUMS))
+            if digest != expected[name]:
+                raise ValueError('Checksum mismatch: %s' % part)
+
+        if verbose:
+            print('  verified %d parts against %s\n' % (len(parts), filename))
+
+    os.makedirs(path_study, exist_ok=True)
+    with open(recorded, 'w') as file:
+        file.write(''.join('%s  %s\n' % (digest, basename(part))
+            for part, digest in zip(parts, digests)))
+
+
+def _read_checksums(filename):
+    expected = {}
+    with open(filename) as file:
+        for line in file:
+            if line.strip():
+                digest, name = line.split()
+                expected[basename(name.lstrip('*'))] = digest
+    return expected
+
+
+def _sha256(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(2**20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _extract(parts, study, path_study, installed, workers, pack_events,
+    pattern, verbose):
+    """ Streams the concatenated parts through the decompressor, writing
+    files and packing completed events in a thread pool
+    """
+    os.makedirs(path_study, exist_ok=True)
+
+    extracted, packing = [], []
+    current, pending = None, []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool,\
+        tarfile.open(fileobj=_Parts(parts), mode='r|gz') as archive:
+
+        for member in archive:
+            event, relative = _event(member.name, study)
+            if event is None or event in installed:
+                continue
+
+            if event != current:
+                if current:
+                    packing += _finish(pool, path_study, current, pending,
+                        pack_events, pattern, verbose)
+                    extracted += [current]
+                current, pending = event, []
+
+            target = join(path_study, relative)
+
+            if member.isdir():
+                os.makedirs(target, exist_ok=True)
+            elif member.isfile():
+                # the stream is read sequentially, writes happen in parallel
+                data = archive.extractfile(member).read()
+                pending += [pool.submit(_write, target, data)]
+
+        if current:
+            packing += _finish(pool, path_study, current, pending,
+                pack_events, pattern, verbose)
+            extracted += [current]
+
+        for task in packing:
+            task.result()
+
+    events = sorted(installed_events(path_study))
+    with open(join(path_study, COMPLETE), 'w') as file:
+        file.write(''.join(event+'\n' for event in events))
+
+    if verbose:
+        print('\n%s: installed %d events, %d already present\n' % (
+            study, len(extracted), len(installed)))
+
+    return extracted
+
+
+def _event(name, study):
+    """ Returns the event and path relative to the study directory of an
+    archive member, or None for members outside any event
+    """
+    name = normpath(name)
+    if name.startswith('/') or name.split('/')[0] == '..':
+        raise ValueError('Unsafe path in archive: %s' % name)
+
+    components = name.split('/')
+    if components[0] == study:
+        components = components[1:]
+
+    if len(components) < 2:
+        return None, None
+
+    return components[0], join(*components)
+
+
+def _write(filename, data):
+    os.makedirs(dirname(filename), exist_ok=True)
+    with open(filename, 'wb') as file:
+        file.write(data)
+
+
+def _finish(pool, path_study, event, pending, pack_events, pattern, verbose):
+    """ Marks an event installed once its files are written, optionally
+    packing it in the background
+    """
+    for task in pending:
+        task.result()
+
+    with open(join(path_study, event, MARKER), 'w'):
+        pass
+
+    if verbose:
+        print('  %s' % event)
+
+    if pack_events:
+        return [pool.submit(pack, join(path_study, event, pattern),
+            join(path_study, event+SUFFIX))]
+    return []
+
+
+class _Parts(io.RawIOBase):
+    """ Reads a sequence of files as one stream, like ``cat part?``
+    """
+    def __init__(self, filenames):
+        self.filenames = list(filenames)
+        self.file = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self.file is None:
+                if not self.filenames:
+                    return 0
+                self.file = open(self.filenames.pop(0), 'rb')
+
+            count = self.file.readinto(buffer)
+            if count:
+                return count
+
+            self.file.close()
+            self.file = None
+
+    def close(self):
+        if self.file:
+            self.file.close()
+        super(_Parts, self).close()
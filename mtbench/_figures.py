@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from os.path import basename
+
+
+class FigureExecutor(object):
+    """ Runs independent plotting calls, optionally in a pool of worker
+    processes using a non-interactive matplotlib backend
+
+    Each call is timed; ``wait`` prints per-figure timings and returns them
+    as a list of (filename, seconds) tuples. Without a pool, calls run
+    immediately and any error is raised from ``submit``
+
+    Several executors can share one `pool`, e.g. from ``figure_pool``, in
+    which case waiting on one executor leaves the pool running
+    """
+    def __init__(self, workers=1, verbose=True, pool=None):
+        self.workers = workers
+        self.verbose = verbose
+        self.pool = pool
+        self.shared = pool is not None
+        self.tasks = []
+
+        if pool is None and workers > 1:
+            self.pool = figure_pool(workers)
+
+    def submit(self, func, filename, *args, **kwargs):
+        if self.pool:
+            self.tasks += [(filename, self.pool.submit(
+                _plot, func, filename, *args, **kwargs))]
+        else:
+            # in the calling process, errors propagate with their traceback
+            start = time.perf_counter()
+            func(filename, *args, **kwargs)
+            self.tasks += [(filename, (time.perf_counter() - start, None))]
+
+    def wait(self):
+        timings = []
+        nfailed = 0
+
+        for filename, task in self.tasks:
+            elapsed, error = task.result() if self.pool else task
+            timings += [(filename, elapsed)]
+
+            if error:
+                nfailed += 1
+                print('  failed to plot %s\n%s' % (filename, error))
+
+        if self.pool and not self.shared:
+            self.pool.shutdown()
+            self.pool = None
+        self.tasks = []
+
+        if self.verbose and timings:
+            print('\n  figure timings:')
+            for filename, elapsed in timings:
+                print('    %8.2f s  %s' % (elapsed, basename(filename)))
+            print('    %8.2f s  total for %d figures\n' % (
+                sum(elapsed for _, elapsed in timings), len(timings)))
+
+        if nfailed:
+            raise RuntimeError('%d figures failed' % nfailed)
+
+        return timings
+
+
+def figure_pool(workers):
+    """ Returns a pool of worker processes using a non-interactive
+    matplotlib backend
+    """
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _plot(func, filename, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+        func(filename, *args, **kwargs)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return time.perf_counter() - start, error
+
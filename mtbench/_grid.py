@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import warnings
+import numpy as np
+from os.path import exists, expanduser, join
+from scipy.stats import qmc
+
+from mtuq.grid import DoubleCoupleGridRegular, FullMomentTensorGridSemiregular,\
+    Grid, UnstructuredGrid
+from mtuq.util.math import to_mij
+
+from mtbench._cache import cache_key
+from mtbench._math import to_mt, to_rho
+
+
+# default location of the on-disk grid cache
+GRID_CACHE = os.environ.get('MTBENCH_GRID_CACHE',
+    join(expanduser('~'), '.cache', 'mtbench', 'grids'))
+
+# (v, w, kappa, sigma, h) bounds of Tape and Tape (2015) parameterization
+LOWER = [-1./3., -3./8.*np.pi, 0., -90., 0.]
+UPPER = [+1./3., +3./8.*np.pi, 360., +90., 1.]
+
+SHAPE_DIMS = ('v', 'w', 'kappa', 'sigma', 'h')
+
+# sources per block when cached grids are scaled lazily
+CHUNK_SIZE = 100000
+
+
+def FullMomentTensorGridQuasiRandom(magnitudes=[1.], npts=1000000,
+    sequence='sobol', seed=0):
+    """ Full moment tensor grid drawn from a scrambled low-discrepancy
+    sequence
+
+    Points are uniformly distributed in the same (v, w, kappa, sigma, h)
+    parameterization as ``FullMomentTensorGridRandom``, but cover lune and
+    orientation space more evenly for a given number of points. Returns an
+    UnstructuredGrid with `npts` source shapes for each magnitude
+
+    `sequence` is 'sobol' or 'halton'
+    """
+    shapes = _quasi_random_shapes(npts, sequence, seed)
+    magnitudes = np.atleast_1d(magnitudes)
+
+    rho = np.repeat([to_rho(Mw) for Mw in magnitudes], npts)
+    v, w, kappa, sigma, h = np.tile(shapes, (len(magnitudes), 1)).T
+
+    return UnstructuredGrid(
+        dims=('rho', 'v', 'w', 'kappa', 'sigma', 'h'),
+        coords=(rho, v, w, kappa, sigma, h),
+        callback=to_mt)
+
+
+def cached_grid(grid_type, magnitudes=[1.], npts=None, npts_per_axis=None,
+    seed=0, path_cache=GRID_CACHE):
+    """ Returns a moment tensor grid whose source shapes, and their
+    unit-moment Mij arrays, are generated once and memory-mapped from disk
+    on later calls
+
+    Grid types are 'random', 'sobol' or 'halton' (`npts` shapes, seeded),
+    returning an UnstructuredGrid, or 'semiregular' or 'dc' (`npts_per_axis`),
+    returning a regular Grid. Magnitudes are applied by scaling the cached
+    arrays, so a new event costs no more than reading them. ``chunks``
+    scales one block at a time, while ``to_array`` returns a scaled copy of
+    the whole grid for callers that need one
+    """
+    if grid_type in ('random', 'sobol', 'halton'):
+        key = cache_key(grid_type, npts, seed)
+    elif grid_type in ('semiregular', 'dc'):
+        key = cache_key(grid_type, npts_per_axis)
+    else:
+        raise ValueError('Unknown grid type: %s' % grid_type)
+
+    dirname = join(path_cache, key)
+    if not exists(join(dirname, 'mij.npy')):
+        _generate(dirname, grid_type, npts, npts_per_axis, seed)
+
+    unit = np.load(join(dirname, 'mij.npy'), mmap_mode='r')
+    rho = np.array([to_rho(Mw) for Mw in np.atleast_1d(magnitudes)])
+
+    if grid_type in ('semiregular', 'dc'):
+        with np.load(join(dirname, 'coords.npz')) as coords:
+            coords = [rho] + [coords[dim] for dim in SHAPE_DIMS]
+
+        return CachedGrid(unit,
+            dims=('rho',)+SHAPE_DIMS,
+            coords=coords,
+            callback=to_mt)
+
+    shapes = np.load(join(dirname, 'coords.npy'), mmap_mode='r')
+    if len(rho) == 1:
+        coords = [np.repeat(rho, len(shapes))] + list(shapes.T)
+    else:
+        coords = [np.repeat(rho, len(shapes))] + list(np.tile(shapes, (len(rho), 1)).T)
+
+    return CachedUnstructuredGrid(unit,
+        dims=('rho',)+SHAPE_DIMS,
+        coords=coords,
+        callback=to_mt)
+
+
+class CachedGrid(Grid):
+    """ Regular grid whose Mij array is the cached unit-moment array scaled
+    by each magnitude
+    """
+    def __init__(self, unit, **kwargs):
+        super(CachedGrid, self).__init__(**kwargs)
+        self.unit = unit
+
+    def to_array(self):
+        return _scale(self.unit, self._rho())
+
+    def chunks(self, size=CHUNK_SIZE):
+        return _chunks(self.unit, self._rho(), size)
+
+    def _rho(self):
+        # rho is the slowest-varying dimension
+        return np.atleast_1d(self.coords[0])
+
+
+class CachedUnstructuredGrid(UnstructuredGrid):
+    """ Unstructured grid whose Mij array is the cached unit-moment array
+    scaled by each magnitude
+    """
+    def __init__(self, unit, **kwargs):
+        super(CachedUnstructuredGrid, self).__init__(**kwargs)
+        self.unit = unit
+
+    def to_array(self):
+        return _scale(self.unit, self._rho())
+
+    def chunks(self, size=CHUNK_SIZE):
+        return _chunks(self.unit, self._rho(), size)
+
+    def _rho(self):
+        rho = np.asarray(self.coords[0])
+        return rho[::len(self.unit)]
+
+
+def source_chunks(sources, size=CHUNK_SIZE):
+    """ Returns a function yielding consecutive blocks of the source array of
+    a grid, which together make up ``to_array()``
+
+    Cached grids scale one block of their memory-mapped unit-moment array at
+    a time. Other grids are expanded once, and their array is yielded whole
+    """
+    if hasattr(sources, 'chunks'):
+        return lambda: sources.chunks(size)
+
+    if hasattr(sources, 'to_array'):
+        sources = sources.to_array()
+    return lambda: iter([sources])
+
+
+def _scale(unit, rho):
+    array = np.empty((len(rho)*len(unit), unit.shape[1]))
+    for _k, value in enumerate(rho):
+        np.multiply(unit, value, out=array[_k*len(unit):(_k+1)*len(unit)])
+    return array
+
+
+def _chunks(unit, rho, size):
+    for value in rho:
+        for start in range(0, len(unit), size):
+            yield np.multiply(unit[start:start+size], value)
+
+
+def _generate(dirname, grid_type, npts, npts_per_axis, seed):
+    """ Writes source shapes and unit-moment Mij arrays, staging them so that
+    concurrent runs never see a partial entry
+    """
+    staging = dirname+'.tmp%d' % os.getpid()
+    os.makedirs(staging)
+
+    if grid_type in ('semiregular', 'dc'):
+        if grid_type == 'semiregular':
+            grid = FullMomentTensorGridSemiregular(npts_per_axis=npts_per_axis)
+        else:
+            grid = DoubleCoupleGridRegular(npts_per_axis=npts_per_axis)
+
+        dims = list(grid.dims)
+        coords = {dim: np.atleast_1d(np.asarray(grid.coords[dims.index(dim)],
+            dtype=float)) for dim in SHAPE_DIMS}
+        np.savez(join(staging, 'coords.npz'), **coords)
+
+        unit = Grid(dims=('rho',)+SHAPE_DIMS,
+            coords=[[1.]] + [coords[dim] for dim in SHAPE_DIMS],
+            callback=to_mt).to_array()
+
+    else:
+        if grid_type == 'random':
+            shapes = np.random.default_rng(seed).uniform(LOWER, UPPER,
+                size=(npts, len(SHAPE_DIMS)))
+        else:
+            shapes = _quasi_random_shapes(npts, grid_type, seed)
+        np.save(join(staging, 'coords.npy'), shapes)
+
+        unit = np.array([to_mij(1., *shape) for shape in shapes])
+
+    np.save(join(staging, 'mij.npy'), np.asarray(unit, dtype=float))
+
+    shutil.rmtree(dirname, ignore_errors=True)
+    os.replace(staging, dirname)
+
+
+def _quasi_random_shapes(npts, sequence, seed):
+    if sequence == 'sobol':
+        sampler = qmc.Sobol(d=5, scramble=True, seed=seed)
+    elif sequence == 'halton':
+        sampler = qmc.Halton(d=5, scramble=True, seed=seed)
+    else:
+        raise ValueError('Unknown sequence: %s' % sequence)
+
+    with warnings.catch_warnings():
+        # Sobol balance properties hold only for powers of two
+        warnings.simplefilter('ignore', UserWarning)
+        samples = sampler.random(npts)
+
+    return qmc.scale(samples, LOWER, UPPER)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+#
+# Analytic magnitude profiling
+#
+# Synthetics are linear in scalar moment, so for a fixed source shape the L2
+# misfit at scale s relative to a reference moment is
+#
+#     misfit(s) = A - 2 s B + s**2 C
+#
+# where A is the data energy. Evaluating each shape at s=1 and s=2, plus a
+# single zero-moment source for A, determines B and C, and hence the misfit
+# at every magnitude and the best-fitting magnitude in closed form
+#
+
+import numpy as np
+import pandas
+import xarray
+
+from mtuq.grid import Grid, UnstructuredGrid
+from mtuq.grid_search import MTUQDataArray, MTUQDataFrame
+
+from mtbench._grid import CachedUnstructuredGrid
+from mtbench._math import to_mt
+
+
+def profile_magnitude(evaluate, grid, misfit_functions):
+    """ Returns misfit on every point of `grid`, a moment tensor grid with one
+    or more magnitudes, plus the best-fitting moment magnitude for each
+    source shape, while evaluating only two magnitudes per shape
+
+    `evaluate` takes a grid and returns one result per data type, as
+    returned by grid_search. Results have the same dimensions as a
+    grid_search over `grid` itself, so they can be plotted as usual
+    """
+    for misfit in misfit_functions:
+        if getattr(misfit, 'norm', 'L2') != 'L2':
+            raise ValueError('Magnitude profiling requires an L2 misfit')
+
+    dims = list(grid.dims)
+    if 'rho' not in dims:
+        raise ValueError('Magnitude profiling requires a moment tensor grid')
+
+    # data energy, from synthetics of a zero-moment source
+    energy = [float(np.asarray(ds.values).sum()) for ds in evaluate(
+        UnstructuredGrid(
+            dims=('rho', 'v', 'w', 'kappa', 'sigma', 'h'),
+            coords=([0.], [0.], [0.], [0.], [0.], [0.]),
+            callback=to_mt))]
+
+    if issubclass(type(grid), Grid):
+        return _profile_regular(evaluate, grid, dims, energy)
+    else:
+        return _profile_unstructured(evaluate, grid, dims, energy)
+
+
+def _profile_regular(evaluate, grid, dims, energy):
+    rho = np.asarray(grid.coords[dims.index('rho')], dtype=float)
+    rho_ref = _reference(rho)
+
+    coords = list(grid.coords)
+    coords[dims.index('rho')] = np.array([rho_ref, 2.*rho_ref])
+
+    results = evaluate(Grid(dims=grid.dims, coords=coords,
+        callback=grid.callback))
+
+    scale = xarray.DataArray(rho/rho_ref, dims='rho', coords={'rho': rho})
+
+    results_sum, best_magnitudes = [], []
+    for A, ds in zip(energy, results):
+        B, C = _coefficients(A,
+            ds.isel(rho=0, drop=True), ds.isel(rho=1, drop=True))
+
+        profile = (A - 2.*scale*B + scale**2*C).transpose(*ds.dims)
+        results_sum += [MTUQDataArray(**{
+            'data': profile.values,
+            'coords': profile.coords,
+            'dims': profile.dims,
+            })]
+
+        best = _best_magnitude(B, C, rho, rho_ref)
+        best_magnitudes += [MTUQDataArray(**{
+            'data': best.values,
+            'coords': best.coords,
+            'dims': best.dims,
+            })]
+
+    return results_sum, best_magnitudes
+
+
+def _profile_unstructured(evaluate, grid, dims, energy):
+    points = grid.to_dataframe()
+    rho = np.asarray(points['rho'], dtype=float)
+    rho_ref = _reference(rho)
+
+    shape_dims = [dim for dim in dims if dim != 'rho']
+
+    if isinstance(grid, CachedUnstructuredGrid):
+        # shapes repeat once per magnitude, in cache order
+        nshapes = len(grid.unit)
+        shapes = np.column_stack(
+            [np.asarray(points[dim], dtype=float)[:nshapes] for dim in shape_dims])
+        inverse = np.arange(len(rho)) % nshapes
+    else:
+        shapes, inverse = np.unique(
+            np.column_stack([np.asarray(points[dim], dtype=float) for dim in shape_dims]),
+            axis=0, return_inverse=True)
+        inverse = inverse.flatten()
+        nshapes = len(shapes)
+
+    coords = {'rho': np.repeat([rho_ref, 2.*rho_ref], nshapes)}
+    for _k, dim in enumerate(shape_dims):
+        coords[dim] = np.tile(shapes[:, _k], 2)
+
+    if isinstance(grid, CachedUnstructuredGrid):
+        results = evaluate(CachedUnstructuredGrid(grid.unit, dims=grid.dims,
+            coords=[coords[dim] for dim in dims], callback=grid.callback))
+    else:
+        results = evaluate(UnstructuredGrid(dims=grid.dims,
+            coords=[coords[dim] for dim in dims], callback=grid.callback))
+
+    results_sum, best_magnitudes = [], []
+    for A, ds in zip(energy, results):
+        values = np.asarray(ds.values).flatten()
+        B, C = _coefficients(A, values[:nshapes], values[nshapes:])
+
+        scale = rho/rho_ref
+        results_sum += [_to_dataframe(ds, points, dims,
+            A - 2.*scale*B[inverse] + scale**2*C[inverse])]
+
+        best = pandas.DataFrame(shapes, columns=shape_dims)
+        best_magnitudes += [_to_dataframe(ds, best, dims,
+            np.asarray(_best_magnitude(B, C, rho, rho_ref)))]
+
+    return results_sum, best_magnitudes
+
+
+def _coefficients(A, f1, f2):
+    # f1 = A - 2B + C, f2 = A - 4B + 4C
+    C = (f2 - 2.*f1 + A)/2.
+    B = (A - f1 + C)/2.
+    return B, C
+
+
+def _best_magnitude(B, C, rho, rho_ref):
+    """ Returns the moment magnitude minimizing misfit, within the range of
+    magnitudes on the grid
+    """
+    scale = (B/C).where(C > 0., 0.) if hasattr(B, 'where') else\
+        np.where(C > 0., B/np.where(C > 0., C, 1.), 0.)
+    scale = np.clip(scale, rho.min()/rho_ref, rho.max()/rho_ref)
+
+    # rho = sqrt(2) M0
+    return (np.log10(scale*rho_ref/np.sqrt(2.)) - 9.1)/1.5
+
+
+def _reference(rho):
+    return np.sqrt(rho.min()*rho.max())
+
+
+def _to_dataframe(ds, points, dims, values):
+    """ Returns values on the given points, indexed like the grid_search
+    result `ds`
+    """
+    index = {}
+    for name in ds.index.names:
+        if name in points:
+            index[name] = np.asarray(points[name])
+        elif name in dims:
+            # profiled out
+            continue
+        elif name == 'source_idx':
+            # rows of `points`, not of the evaluated grid
+            index[name] = np.arange(len(values))
+        else:
+            # e.g. origin index, constant over the evaluated grid
+            index[name] = np.repeat(ds.index.get_level_values(name)[0], len(values))
+
+    return MTUQDataFrame({ds.columns[0]: values},
+        index=pandas.MultiIndex.from_frame(pandas.DataFrame(index)))
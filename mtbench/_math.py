@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+from mtuq.event import MomentTensor
+from mtuq.util.math import to_mij
+
+
+def moment(Mw):
+    return 10.**(1.5*Mw + 9.1)
+
+
+def to_rho(Mw):
+    return np.sqrt(2.)*moment(Mw)
+
+
+def to_mt(rho, v, w, kappa, sigma, h):
+    """ Converts lune and orientation parameters to a MomentTensor object
+
+    Defined at module level, so that grids using it as a callback can be
+    pickled and sent to worker processes
+    """
+    return MomentTensor(to_mij(rho, v, w, kappa, sigma, h), convention='USE')
+
+
+def to_v(gamma):
+    """ Converts lune longitude in degrees to Tape and Tape (2015) v
+    """
+    return np.sin(3.*np.radians(gamma))/3.
+
+
+def to_w(delta):
+    """ Converts lune latitude in degrees to Tape and Tape (2015) w
+    """
+    beta = np.radians(90. - delta)
+    u = 0.75*beta - 0.5*np.sin(2.*beta) + 0.0625*np.sin(4.*beta)
+    return 3.*np.pi/8. - u
+
+
+def to_h(theta):
+    """ Converts dip in degrees to Tape and Tape (2015) h
+    """
+    return np.cos(np.radians(theta))
+
+
+def from_expected(expected):
+    """ Converts a published solution, as in ``_Alvizuri2018.expected_results``,
+    to a MomentTensor object
+    """
+    return to_mt(np.sqrt(2.)*expected['M0'],
+        to_v(expected['gamma']), to_w(expected['delta']),
+        expected['kappa'], expected['sigma'], to_h(expected['theta']))
+
+
+def angular_distance(M1, M2):
+    """ Angle in degrees between two moment tensors, each given as a
+    MomentTensor or as a 6-vector in up-south-east convention
+    """
+    M1, M2 = _as_vector(M1), _as_vector(M2)
+
+    # off-diagonal elements appear twice in the full tensor
+    weights = np.array([1., 1., 1., 2., 2., 2.])
+
+    product = np.sum(weights*M1*M2, axis=-1)
+    norms = np.sqrt(np.sum(weights*M1**2, axis=-1)*np.sum(weights*M2**2, axis=-1))
+
+    return np.degrees(np.arccos(np.clip(product/norms, -1., 1.)))
+
+
+def _as_vector(M):
+    if hasattr(M, 'as_vector'):
+        return np.asarray(M.as_vector(), dtype=float)
+    return np.asarray(M, dtype=float)
+
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+#
+# Study-wide planning of Green's tensor extraction
+#
+# For 1D models a Green's tensor depends on source-receiver distance and
+# source depth only, so events sharing stations and depths can share
+# extractions. Each unique (distance, depth) is read from the database once,
+# and copies are retargeted to the station and origin of each event
+#
+
+import threading
+from time import perf_counter
+
+from mtuq.greens_tensor.base import GreensTensorList
+
+
+# distance resolution in meters of each supported 1D solver. FK databases
+# store one file per kilometer of distance, so rounding to the nearest
+# kilometer selects the same file the database would. syngine computes
+# tensors at any distance; within 100 m, travel times differ by less than
+# 0.05 s, well below the sample interval of the processed waveforms
+RESOLUTION = {
+    'FK': 1000.,
+    'syngine': 100.,
+    }
+
+
+class GreensPlan(object):
+    """ Green's tensors for all events of a study, each unique (distance,
+    depth) extracted once
+
+    Needs are registered with ``add`` for every event, and extracted in bulk,
+    ordered by depth and distance, on the first ``get``. Distances are
+    compared after rounding to `resolution` meters, by default the
+    solver's entry in RESOLUTION
+
+    Only 1D solvers are supported, since in 3D models tensors also depend on
+    source and receiver location. A plan holds raw tensors of a single
+    database in memory for the whole study
+    """
+    def __init__(self, solver, resolution=None, verbose=True):
+        if solver not in RESOLUTION:
+            raise ValueError("Bulk Green's tensor retrieval requires a 1D "
+                "solver (%s), not %s" % (', '.join(RESOLUTION), solver))
+
+        self.solver = solver
+        self.resolution = resolution or RESOLUTION[solver]
+        self.verbose = verbose
+        self.needs = {}
+        self.tensors = {}
+        self.requested = 0
+        self.lock = threading.Lock()
+
+    def add(self, stations, origins):
+        """ Registers the stations of an event at each of its origins
+        """
+        for origin in origins:
+            for station in stations:
+                self.needs.setdefault(self._key(station, origin),
+                    (station, origin))
+                self.requested += 1
+
+    def get(self, db, stations, origin, model=None):
+        """ Returns Green's tensors for the given stations and origin,
+        extracting all planned tensors from `db` on first use
+        """
+        with self.lock:
+            if not self.tensors:
+                self._extract(db, self.needs, model)
+
+            # stations not planned for are extracted individually
+            unplanned = {}
+            for station in stations:
+                key = self._key(station, origin)
+                if key not in self.tensors:
+                    unplanned[key] = (station, origin)
+            if unplanned:
+                self._extract(db, unplanned, model)
+
+            return GreensTensorList([_retarget(
+                self.tensors[self._key(station, origin)], station, origin)
+                for station in stations])
+
+    def _key(self, station, origin):
+        return int(round(station.distance_in_m/self.resolution)),\
+            origin.depth_in_m
+
+    def _extract(self, db, needs, model):
+        """ Reads tensors for the given needs, ordered by depth and distance
+        so that neighbouring reads hit neighbouring parts of the database
+        """
+        start = perf_counter()
+
+        for key in sorted(needs, key=lambda key: (key[1], key[0])):
+            station, origin = needs[key]
+            self.tensors[key] = db.get_greens_tensors([station], origin, model)[0]
+
+        if self.verbose:
+            print("  extracted %d Green's tensors in %.2f s, %d requested "
+                "by all events\n" % (len(needs), perf_counter() - start,
+                self.requested))
+
+
+def _retarget(tensor, station, origin):
+    """ Returns a copy of a tensor for another station and origin at the same
+    distance and depth, shifted by the difference in origin time
+    """
+    shift = origin.time - tensor.origin.time
+
+    traces = []
+    for trace in tensor:
+        trace = trace.copy()
+        trace.stats.starttime += shift
+        trace.stats.network = station.network
+        trace.stats.station = station.station
+        trace.stats.location = station.location
+        traces += [trace]
+
+    return type(tensor)(traces=traces, station=station, origin=origin,
+        id=station.id, tags=list(tensor.tags),
+        include_mt=tensor.include_mt, include_force=tensor.include_force)
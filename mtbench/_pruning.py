@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+#
+# Branch-and-bound pruning across stations, for runs that need only the best
+# sources rather than full misfit surfaces
+#
+
+import numpy as np
+
+
+class Pruning(object):
+    """ Skips further stations for grid points that cannot be among the `k`
+    best
+
+    The objective is a sum of non-negative station terms over all data types,
+    each data type scaled by its positive entry in `weights`, as in the
+    weighted sum bench() minimizes. Once a point's partial sum exceeds the
+    k-th best objective of a random sample of fully evaluated points, it
+    cannot be among the k best and no more stations are evaluated for it.
+    Stations are evaluated in order of how much their misfit varies over the
+    sample, so that the most discriminating stations come first
+
+    Points not fully evaluated for a data type hold inf in its surface, so
+    the minimum and the k smallest values of the weighted sum are exact
+    """
+    def __init__(self, k=1, sample_size=1000, weights=None, seed=0):
+        if weights is not None and min(weights) <= 0.:
+            raise ValueError('Pruning requires positive data type weights')
+
+        self.k = k
+        self.sample_size = sample_size
+        self.weights = weights
+        self.seed = seed
+        self.threshold = np.inf
+        self.orders = []
+        self.partials = []
+        self.evaluated = 0
+        self.total = 0
+
+    def sample(self, processed_data, processed_greens, misfit_functions,
+        stations, grid):
+        """ Fully evaluates a random sample of grid points to obtain the
+        pruning threshold and station order for each data type
+        """
+        sources = grid.to_array()
+        rng = np.random.default_rng(self.seed)
+        idx = rng.choice(len(sources), min(self.sample_size, len(sources)),
+            replace=False)
+
+        totals = np.zeros(len(idx))
+        self.orders = []
+
+        for _i, misfit in enumerate(misfit_functions):
+            values = []
+            for station in stations:
+                values += [np.asarray(misfit(
+                    processed_data[_i].select(station),
+                    processed_greens[_i].select(station),
+                    sources[idx])).flatten()]
+
+            totals += self._weight(_i)*np.sum(values, axis=0)
+            self.orders += [np.argsort(-np.std(values, axis=1), kind='stable')]
+
+        self.threshold = np.sort(totals)[min(self.k, len(totals))-1]
+
+    def wrap(self, _i, misfit, stations):
+        """ Returns a misfit function for data type `_i` that evaluates
+        stations in order, skipping pruned points
+        """
+        return _PrunedMisfit(self, misfit,
+            [stations[_j] for _j in self.orders[_i]], self._weight(_i))
+
+    def _weight(self, _i):
+        return 1. if self.weights is None else self.weights[_i]
+
+    @property
+    def skipped(self):
+        """ Fraction of station evaluations skipped
+        """
+        if not self.total:
+            return 0.
+        return 1. - self.evaluated/self.total
+
+
+class _PrunedMisfit(object):
+    def __init__(self, pruning, misfit, stations, weight=1.):
+        self.pruning = pruning
+        self.misfit = misfit
+        self.stations = stations
+        self.weight = weight
+        self.calls = 0
+
+    def __getattr__(self, name):
+        if name == 'misfit':
+            raise AttributeError(name)
+        return getattr(self.misfit, name)
+
+    def __call__(self, data, greens, sources, *args, **kwargs):
+        # grid_search calls the misfit function once per origin; partial sums
+        # carry over from one data type to the next
+        state = self.pruning
+        if hasattr(sources, 'to_array'):
+            sources = sources.to_array()
+
+        if len(state.partials) <= self.calls:
+            state.partials += [np.zeros(len(sources))]
+        partial = state.partials[self.calls]
+        self.calls += 1
+
+        start = partial.copy()
+        complete = np.ones(len(sources), dtype=bool)
+
+        for station in self.stations:
+            complete &= partial <= state.threshold
+            alive = np.flatnonzero(complete)
+            state.total += len(sources)
+            state.evaluated += len(alive)
+
+            if not len(alive):
+                continue
+
+            partial[alive] += self.weight*np.asarray(self.misfit(
+                data.select(station), greens.select(station),
+                sources[alive], *args, **kwargs)).flatten()
+
+        # partial sums of pruned points are lower bounds, not misfit values
+        values = np.where(complete, (partial - start)/self.weight, np.inf)
+        return values.reshape(-1, 1)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+# number of blocks in this process in which phases of different runs may
+# overlap in threads, see ``concurrent_phases``
+_concurrent = 0
+_lock = threading.Lock()
+
+
+class Report(object):
+    """ Records wall time, CPU time and peak memory for each phase of a
+    bench() run and writes them as a machine-readable JSON report
+
+    Per-phase peaks are recorded where the kernel allows resetting the
+    peak resident set size (Linux), except within ``concurrent_phases``.
+    ``info['peak_rss_per_phase']`` tells whether they were. The whole-process
+    peak is always written
+    """
+    def __init__(self, event_id, **info):
+        self.per_phase = not _concurrent and reset_peak_rss()
+        self.info = dict(_environment(), event_id=event_id,
+            start_time=time.strftime('%Y-%m-%dT%H:%M:%S'),
+            peak_rss_per_phase=self.per_phase, **info)
+        self.phases = []
+
+        # running peaks of the phases currently open, outermost first
+        self.open = []
+
+    @contextmanager
+    def phase(self, name, **info):
+        """ Times the enclosed block, and records its peak memory if
+        per-phase peaks are available
+        """
+        if self.per_phase:
+            self._enter()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield info
+        finally:
+            self.add(name,
+                wall_time=time.perf_counter() - wall,
+                cpu_time=time.process_time() - cpu,
+                peak_rss=self._exit() if self.per_phase else None,
+                **info)
+
+    def add(self, name, wall_time, cpu_time=None, peak_rss=None, **info):
+        """ Records a phase timed elsewhere, e.g. in a worker process
+        """
+        self.phases += [dict(name=name,
+            wall_time=wall_time,
+            cpu_time=cpu_time,
+            peak_rss=peak_rss,
+            **info)]
+
+    def _enter(self):
+        # enclosing phases keep the peak reached so far before it is reset
+        current = peak_rss()
+        self.open = [max(peak, current) for peak in self.open] + [0]
+        reset_peak_rss()
+
+    def _exit(self):
+        current = peak_rss()
+        peak = max(self.open.pop(), current)
+        self.open = [max(_peak, peak) for _peak in self.open]
+        return peak
+
+    def summary(self):
+        """ Returns wall time, CPU time and peak memory totalled by phase
+        name, plus grid-points-per-second throughput of misfit evaluation.
+        Peak memory is None without per-phase peaks
+        """
+        summary = {}
+        for phase in self.phases:
+            totals = summary.setdefault(phase['name'], {
+                'count': 0, 'wall_time': 0., 'cpu_time': 0., 'peak_rss': None})
+            totals['count'] += 1
+            totals['wall_time'] += phase['wall_time']
+            totals['cpu_time'] += phase['cpu_time'] or 0.
+            if phase['peak_rss'] is not None:
+                totals['peak_rss'] = max(totals['peak_rss'] or 0,
+                    phase['peak_rss'])
+
+        misfit = [phase for phase in self.phases if phase['name'] == 'misfit']
+        if misfit:
+            summary['misfit']['throughput'] =\
+                sum(phase['npts'] for phase in misfit)/\
+                sum(phase['wall_time'] for phase in misfit)
+
+        return summary
+
+    def write(self, filename):
+        # peaks over the lifetime of this process and its children
+        info = dict(self.info,
+            peak_rss=_lifetime_peak_rss(),
+            peak_rss_children=_lifetime_peak_rss(children=True))
+
+        with open(filename, 'w') as file:
+            json.dump({
+                'info': info,
+                'summary': self.summary(),
+                'phases': self.phases,
+                }, file, indent=2, default=str)
+
+
+class NullReport(object):
+    """ Stand-in for Report where no instrumentation is wanted
+    """
+    @contextmanager
+    def phase(self, name, **info):
+        yield info
+
+    def add(self, *args, **kwargs):
+        pass
+
+
+@contextmanager
+def concurrent_phases():
+    """ Marks a block in which runs overlap in threads of this process, as
+    in pipelined studies
+
+    The peak resident set size is process-wide, so resetting it for one
+    phase would disturb the peaks of phases running in other threads.
+    Reports started within the block record no per-phase peaks, only the
+    whole-process peak
+    """
+    global _concurrent
+    with _lock:
+        _concurrent += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _concurrent -= 1
+
+
+def peak_rss():
+    """ Returns peak resident set size in bytes since the last call to
+    ``reset_peak_rss``, or over the lifetime of the process where resetting
+    is not supported
+    """
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])*1024
+    except OSError:
+        pass
+    return _lifetime_peak_rss()
+
+
+def reset_peak_rss():
+    """ Resets the peak resident set size to the current one, returning
+    whether this is supported
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _lifetime_peak_rss(children=False):
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    maxrss = resource.getrusage(who).ru_maxrss
+
+    # kilobytes on Linux, bytes on macOS
+    if sys.platform == 'darwin':
+        return maxrss
+    return maxrss*1024
+
+
+def _environment():
+    versions = {}
+    for name in ('mtuq', 'numpy', 'obspy', 'scipy'):
+        module = sys.modules.get(name)
+        versions[name] = getattr(module, '__version__', None)
+
+    return {
+        'hostname': platform.node(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'versions': versions,
+        }
+
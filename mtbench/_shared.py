@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+import mmap
+import os
+import pickle
+import tempfile
+import numpy as np
+from os.path import exists
+
+
+# alignment of arrays within shared memory files
+ALIGN = 64
+
+
+def shared_dir():
+    """ Returns a directory backed by shared memory, if available
+    """
+    if exists('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def share(obj, dirname=None):
+    """ Writes the NumPy arrays inside `obj` into a single shared memory file
+
+    Uses pickle protocol 5 out-of-band buffers, so only a small skeleton
+    needs to be sent to other processes. Returns (filename, skeleton, layout)
+    to be passed to ``attach``
+    """
+    buffers = []
+    skeleton = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+
+    fd, filename = tempfile.mkstemp(prefix='mtbench_', suffix='.shm',
+        dir=dirname or shared_dir())
+
+    layout = []
+    with os.fdopen(fd, 'wb') as file:
+        offset = 0
+        for buffer in buffers:
+            raw = buffer.raw()
+            padding = -offset % ALIGN
+            file.write(b'\0'*padding)
+            offset += padding
+            layout += [(offset, raw.nbytes)]
+            file.write(raw)
+            offset += raw.nbytes
+
+    return filename, skeleton, layout
+
+
+def attach(filename, skeleton, layout):
+    """ Reconstructs an object written by ``share`` without copying its arrays
+
+    Pages are mapped copy-on-write, so writes stay private to the calling
+    process
+    """
+    if not layout:
+        return pickle.loads(skeleton)
+
+    with open(filename, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    view = memoryview(buffer)
+    return pickle.loads(skeleton,
+        buffers=[view[offset:offset+nbytes] for offset, nbytes in layout])
+
+
+def shared_array(values, dirname=None):
+    """ Writes an array to a shared memory file and returns its filename
+    """
+    fd, filename = tempfile.mkstemp(prefix='mtbench_', suffix='.npy',
+        dir=dirname or shared_dir())
+    os.close(fd)
+
+    array = np.lib.format.open_memmap(filename, mode='w+',
+        dtype=values.dtype, shape=values.shape)
+    array[...] = values
+    array.flush()
+    del array
+
+    return filename
+
+
+def load_shared_array(filename):
+    """ Maps an array written by ``shared_array`` and removes the file name,
+    the mapping itself stays valid for as long as the array is in use
+    """
+    array = np.load(filename, mmap_mode='r+')
+    os.unlink(filename)
+    return array
+
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+import json
+import os
+import pickle
+import numpy as np
+from os.path import exists, join
+
+from mtuq.grid_search import DataFrame, MTUQDataArray, MTUQDataFrame
+
+
+class StationStore(object):
+    """ On-disk store of per-station misfit surfaces for a single event
+
+    Surfaces are written to memory-mapped .npy files, one per data type, as
+    they are computed and read back lazily. An index file records station
+    ids, dims and coords, so a store can be reopened later with
+    ``open_station_store`` without repeating the grid search
+
+    Results on unstructured grids are DataFrames, whose row index is saved
+    instead of dims and coords
+    """
+    def __init__(self, dirname):
+        self.dirname = dirname
+        self.index = {}
+        self._arrays = {}
+        self._frames = {}
+
+        if exists(join(dirname, 'index.json')):
+            with open(join(dirname, 'index.json')) as file:
+                self.index = json.load(file)
+
+    @property
+    def labels(self):
+        return list(self.index)
+
+    def stations(self, label):
+        """ Returns station ids for the given data type
+        """
+        return self.index[label]['stations']
+
+    def write(self, label, part, _j, station_ids, values):
+        """ Writes the surface of station `_j` and returns a view of it
+
+        `part` counts calls to the misfit function, i.e. origins
+        """
+        key = (label, part)
+
+        if _j == 0:
+            os.makedirs(self.dirname, exist_ok=True)
+            self._arrays[key] = np.lib.format.open_memmap(
+                join(self.dirname, self._filename(label, part)),
+                mode='w+', dtype=values.dtype,
+                shape=(len(station_ids),)+values.shape)
+
+            self.index[label] = {
+                'stations': list(station_ids),
+                'parts': part+1,
+                }
+
+        self._arrays[key][_j] = values
+        return self._arrays[key][_j]
+
+    def finalize(self, label, total):
+        """ Records dims and coords, or the row index, of the grid search
+        result and writes the index
+        """
+        for key in self._arrays:
+            if key[0] == label:
+                self._arrays[key].flush()
+
+        self.index[label]['shape'] = list(total.shape)
+
+        if issubclass(type(total), DataFrame):
+            self.index[label]['frame'] = True
+            with open(join(self.dirname, '%s_index.pkl' % label), 'wb') as file:
+                pickle.dump((total.columns[0], total.index), file)
+        else:
+            self.index[label]['dims'] = list(total.dims)
+            np.savez(join(self.dirname, '%s_coords.npz' % label),
+                **{dim: np.asarray(total.coords[dim]) for dim in total.dims
+                    if dim in total.coords})
+
+        with open(join(self.dirname, 'index.json'), 'w') as file:
+            json.dump(self.index, file, indent=2)
+
+    def get(self, label, station_id):
+        """ Returns the surface for the given data type and station, read
+        lazily from disk
+        """
+        _j = self.stations(label).index(station_id)
+
+        parts = [self._array(label, part)[_j]
+            for part in range(self.index[label]['parts'])]
+
+        if self.index[label].get('frame'):
+            # rows run over sources for one origin after another
+            column, index = self._index(label)
+            return MTUQDataFrame({column:
+                np.concatenate([np.reshape(part, -1) for part in parts])},
+                index=index)
+
+        if len(parts) > 1:
+            values = np.concatenate(parts, axis=-1)
+        else:
+            values = parts[0]
+
+        return MTUQDataArray(**{
+            'data': values.reshape(self.index[label]['shape']),
+            'coords': self._coords(label),
+            'dims': self.index[label]['dims'],
+            })
+
+    def surfaces(self, label):
+        """ Returns surfaces for all stations in station order
+        """
+        return [self.get(label, station_id)
+            for station_id in self.stations(label)]
+
+    def _array(self, label, part):
+        key = (label, part)
+        if key not in self._arrays:
+            self._arrays[key] = np.load(
+                join(self.dirname, self._filename(label, part)), mmap_mode='r')
+        return self._arrays[key]
+
+    def _index(self, label):
+        # column name and row index of DataFrame results
+        if label not in self._frames:
+            with open(join(self.dirname, '%s_index.pkl' % label), 'rb') as file:
+                self._frames[label] = pickle.load(file)
+        return self._frames[label]
+
+    def _coords(self, label):
+        with np.load(join(self.dirname, '%s_coords.npz' % label)) as coords:
+            return {dim: coords[dim] for dim in coords.files}
+
+    def _filename(self, label, part):
+        return '%s_%d.npy' % (label, part)
+
+
+def open_station_store(dirname):
+    """ Opens the per-station surfaces written by an earlier bench() run
+    """
+    if not exists(join(dirname, 'index.json')):
+        raise FileNotFoundError(join(dirname, 'index.json'))
+    return StationStore(dirname)
+
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from os.path import join
+
+from mtbench._database import DatabasePool
+from mtbench._figures import FigureExecutor, figure_pool
+from mtbench._report import concurrent_phases
+
+
+def run_study(func, event_ids, workers=1, path_logs='logs'):
+    """ Runs ``func(event_id)`` for each event, optionally in a pool of worker
+    processes
+
+    Output from each event goes to its own log file in `path_logs`, or to
+    the console if `path_logs` is None. A failed event is recorded in the
+    summary without aborting the others. Returns a list of per-event
+    summaries, which is also written to `path_logs/summary.json`
+    """
+    if path_logs:
+        os.makedirs(path_logs, exist_ok=True)
+
+    _n = len(event_ids)
+    summaries = []
+
+    def _report(summary):
+        summaries.append(summary)
+        print('EVENT %d of %d  %-20s %-7s %8.1f s' % (
+            len(summaries), _n, summary['event_id'], summary['status'],
+            summary['wall_time']))
+
+    if workers <= 1:
+        for event_id in event_ids:
+            _report(_run_event(func, event_id, path_logs))
+
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_run_event, func, event_id, path_logs):
+                event_id for event_id in event_ids}
+
+            for future in as_completed(futures):
+                try:
+                    summary = future.result()
+                except Exception:
+                    # the worker process itself died
+                    summary = _summary(futures[future], 'failed',
+                        error=traceback.format_exc())
+                _report(summary)
+
+    # report events in the order given rather than order of completion
+    summaries.sort(key=lambda summary: event_ids.index(summary['event_id']))
+
+    if path_logs:
+        with open(join(path_logs, 'summary.json'), 'w') as file:
+            json.dump(summaries, file, indent=2)
+
+    nfailed = sum(summary['status'] != 'ok' for summary in summaries)
+    if nfailed:
+        print('\n%d of %d events failed%s\n' % (nfailed, _n,
+            ', see %s' % path_logs if path_logs else ''))
+
+    return summaries
+
+
+def run_pipeline(func, event_ids, prefetch=1, figure_workers=2,
+    figure_backlog=2, greens_plan=None, path_logs='logs'):
+    """ Runs events through three overlapping stages: a background thread
+    reads and processes data and Green's tensors for upcoming events, the
+    main thread runs the grid search, and figures are plotted behind both in
+    a shared pool of `figure_workers` processes
+
+    `func` is a study script's ``run_event``, which must forward keyword
+    arguments to ``bench``. Green's function databases are opened once and
+    shared by all events through a DatabasePool, and Green's tensors are
+    taken from `greens_plan` if given. At most `prefetch` events are loaded ahead of the
+    grid search, and at most `figure_backlog` events may have figures
+    outstanding before the grid search waits on them, so memory held by the
+    pipeline stays bounded
+
+    Output is not redirected per event, since stages of different events
+    run at the same time, and event reports give whole-process rather than
+    per-phase peak memory for the same reason. Summaries are returned and
+    written to `path_logs/summary.json` as for ``run_study``
+    """
+    os.makedirs(path_logs, exist_ok=True)
+
+    _n = len(event_ids)
+    summaries = []
+
+    # the prefetch stage takes a slot before loading an event, and the slot
+    # is returned once that event's grid search starts
+    slots = threading.BoundedSemaphore(prefetch)
+    loaded = queue.Queue()
+    db_pool = DatabasePool()
+
+    def _prefetch():
+        for event_id in event_ids:
+            slots.acquire()
+            start = time.perf_counter()
+            try:
+                result, error = func(event_id, prefetch_only=True,
+                    db_pool=db_pool, greens_plan=greens_plan), None
+            except Exception:
+                result, error = None, traceback.format_exc()
+            loaded.put((event_id, result, error, time.perf_counter() - start))
+
+    pool = figure_pool(figure_workers)
+    backlog = deque()
+
+    def _drain():
+        event_id, figures, summary = backlog.popleft()
+        start = time.perf_counter()
+        try:
+            figures.wait()
+        except Exception:
+            summary['status'] = 'failed'
+            summary['error'] = traceback.format_exc()
+        summary['figure_wait'] = time.perf_counter() - start
+
+        summaries.append(summary)
+        print('EVENT %d of %d  %-20s %-7s %8.1f s' % (
+            len(summaries), _n, event_id, summary['status'],
+            summary['wall_time']))
+
+    # phases of the prefetched and current events overlap, so reports
+    # record only whole-process peak memory
+    with concurrent_phases():
+        thread = threading.Thread(target=_prefetch, daemon=True)
+        thread.start()
+
+        try:
+            for _ in event_ids:
+                event_id, prefetched, error, load_time = loaded.get()
+                slots.release()
+
+                wall_start, cpu_start = time.perf_counter(), time.process_time()
+                figures = FigureExecutor(pool=pool)
+                best_source = None
+
+                if error is None:
+                    try:
+                        best_source = func(event_id, prefetched=prefetched,
+                            figures=figures)
+                    except Exception:
+                        error = traceback.format_exc()
+                del prefetched
+
+                if error:
+                    print(error)
+
+                summary = _summary(event_id, 'failed' if error else 'ok',
+                    best_source=_to_json(best_source),
+                    wall_time=time.perf_counter() - wall_start,
+                    cpu_time=time.process_time() - cpu_start,
+                    error=error)
+                summary['load_time'] = load_time
+
+                backlog.append((event_id, figures, summary))
+                while len(backlog) > figure_backlog:
+                    _drain()
+
+            while backlog:
+                _drain()
+
+        finally:
+            pool.shutdown()
+            db_pool.summary()
+            db_pool.close()
+
+    with open(join(path_logs, 'summary.json'), 'w') as file:
+        json.dump(summaries, file, indent=2)
+
+    nfailed = sum(summary['status'] != 'ok' for summary in summaries)
+    if nfailed:
+        print('\n%d of %d events failed\n' % (nfailed, _n))
+
+    return summaries
+
+
+def _run_event(func, event_id, path_logs):
+    """ Runs a single event with output redirected to a log file, if
+    `path_logs` is given
+    """
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+
+    if path_logs:
+        output = _redirect(join(path_logs, '%s.log' % event_id))
+    else:
+        output = nullcontext()
+
+    with output:
+        try:
+            best_source = func(event_id)
+            status, error = 'ok', None
+        except Exception:
+            best_source = None
+            status, error = 'failed', traceback.format_exc()
+            print(error)
+
+    return _summary(event_id, status,
+        best_source=_to_json(best_source),
+        wall_time=time.perf_counter() - wall_start,
+        cpu_time=time.process_time() - cpu_start,
+        error=error)
+
+
+def _summary(event_id, status, best_source=None, wall_time=0., cpu_time=0.,
+    error=None):
+    return {
+        'event_id': event_id,
+        'status': status,
+        'best_source': best_source,
+        'wall_time': wall_time,
+        'cpu_time': cpu_time,
+        'error': error,
+        }
+
+
+@contextmanager
+def _redirect(filename):
+    """ Redirects stdout and stderr at the file descriptor level, so that
+    output from compiled extensions is captured too
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    saved = os.dup(1), os.dup(2)
+
+    with open(filename, 'w') as file:
+        os.dup2(file.fileno(), 1)
+        os.dup2(file.fileno(), 2)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+
+
+def _to_json(values):
+    if values is None:
+        return None
+    return {key: float(value) for key, value in dict(values).items()}
+
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+#
+# Concurrent prefetch of syngine Green's functions
+#
+# Requests for all events of a study are collected and deduplicated, then
+# downloaded into mtuq's syngine cache, from which bench() later reads them
+# without further network access
+#
+
+import asyncio
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from mtuq.util.syngine import download_greens_tensor, resolve_model
+
+
+URL = 'http://service.iris.edu/irisws/syngine/1'
+
+
+def syngine_requests(events):
+    """ Returns unique (station, origin) pairs over all events, given as
+    (stations, origins) tuples
+
+    Requests are keyed by what determines the syngine query: distance, depth
+    and origin time
+    """
+    requests = {}
+    for stations, origins in events:
+        for origin in origins:
+            for station in stations:
+                key = (station.distance_in_m, origin.depth_in_m,
+                    str(origin.time))
+                requests.setdefault(key, (station, origin))
+    return list(requests.values())
+
+
+def prefetch_syngine(events, url=URL, model='ak135', connections=8,
+    download=download_greens_tensor, verbose=True):
+    """ Downloads Green's functions for all events, given as (stations,
+    origins) tuples, with at most `connections` requests in flight
+
+    `download` is called as ``download(url, model, station, origin)`` and
+    defaults to mtuq's syngine client, which writes to mtuq's cache. Returns
+    a list of (station, origin, error) tuples for failed requests
+    """
+    requests = syngine_requests(events)
+    ntotal = sum(len(stations)*len(origins) for stations, origins in events)
+
+    if verbose:
+        print("Prefetching syngine Green's functions...\n")
+        print('  %d requests, %d after removing duplicates, %d connections\n' % (
+            ntotal, len(requests), connections))
+
+    start = perf_counter()
+    errors = asyncio.run(_download_all(requests, url, resolve_model(model),
+        connections, download, verbose))
+    elapsed = perf_counter() - start
+
+    failed = [(station, origin, error)
+        for (station, origin), error in zip(requests, errors) if error]
+
+    if verbose:
+        for station, origin, error in failed:
+            print('  failed: %s at %.0f m\n%s' % (
+                station.id, origin.depth_in_m, error))
+        print('\n  %d of %d requests completed in %.1f s\n' % (
+            len(requests)-len(failed), len(requests), elapsed))
+
+    return failed
+
+
+async def _download_all(requests, url, model, connections, download,
+    verbose):
+    # the downloader blocks, so requests run in a pool of `connections`
+    # threads, which bounds how many are open at once
+    loop = asyncio.get_running_loop()
+    ndone = 0
+
+    async def fetch(station, origin):
+        nonlocal ndone
+        try:
+            await loop.run_in_executor(pool, download,
+                url, model, station, origin)
+            error = None
+        except Exception:
+            error = traceback.format_exc()
+
+        ndone += 1
+        if verbose and (ndone % 100 == 0 or ndone == len(requests)):
+            print('  %d of %d' % (ndone, len(requests)))
+        return error
+
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+        return await asyncio.gather(*[fetch(station, origin)
+            for station, origin in requests])
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+
+#
+# Synthetic events for benchmarking without downloaded waveforms or local
+# Green's function databases
+#
+
+import csv
+import os
+import time
+import numpy as np
+from multiprocessing import get_context
+from os.path import join
+
+from obspy import Stream, Trace, UTCDateTime
+from mtuq.dataset import Dataset
+from mtuq.event import Origin
+from mtuq.greens_tensor.base import GreensTensorList
+from mtuq.greens_tensor.FK import GreensTensor
+from mtuq.grid import DoubleCoupleGridRegular, FullMomentTensorGridRandom
+from mtuq.station import Station
+
+from mtbench._grid import FullMomentTensorGridQuasiRandom
+from mtbench._math import angular_distance, to_mt, to_rho
+from mtbench._report import peak_rss
+
+
+# Green's function components in FK convention
+CHANNELS = ['ZSS', 'ZDS', 'ZDD', 'ZEP', 'RSS', 'RDS', 'RDD', 'REP', 'TSS', 'TDS']
+
+# parameters of the source used to generate synthetic data
+SOURCE = {
+    'Mw': 4.5,
+    'v': 0.,
+    'w': 0.,
+    'kappa': 120.,
+    'sigma': 30.,
+    'h': 0.7,
+    }
+
+
+def synthetic_event(distances_in_km, window_length=300., dt=1.,
+    noise_level=0.05, depth_in_m=10000., source=SOURCE, seed=0):
+    """ Generates synthetic data and Green's tensors for stations at the given
+    distances, returning (data, greens, origin, source)
+
+    Green's functions are dispersed wave packets with a different phase for
+    each component, so that the moment tensor is resolvable. Data are
+    synthetics from `source` plus Gaussian noise scaled by `noise_level`
+    """
+    rng = np.random.default_rng(seed)
+
+    origin = Origin({
+        'id': 'synthetic',
+        'time': UTCDateTime(2000, 1, 1),
+        'latitude': 0.,
+        'longitude': 0.,
+        'depth_in_m': depth_in_m,
+        })
+
+    mt = to_mt(to_rho(source['Mw']), source['v'], source['w'],
+        source['kappa'], source['sigma'], source['h'])
+
+    npts = int(round(window_length/dt))
+    t = np.arange(npts)*dt
+
+    greens, streams = [], []
+
+    for _j, distance_in_km in enumerate(distances_in_km):
+        azimuth = rng.uniform(0., 360.)
+
+        station = Station({
+            'network': 'SY',
+            'station': 'S%03d' % _j,
+            'location': '',
+            'id': 'SY.S%03d.' % _j,
+            'latitude': distance_in_km/111.19*np.cos(np.radians(azimuth)),
+            'longitude': distance_in_km/111.19*np.sin(np.radians(azimuth)),
+            'azimuth': azimuth,
+            'back_azimuth': (azimuth + 180.) % 360.,
+            'distance_in_m': distance_in_km*1000.,
+            'starttime': origin.time,
+            'endtime': origin.time + (npts-1)*dt,
+            'npts': npts,
+            'delta': dt,
+            })
+
+        # surface-wave-like arrival with distance-dependent duration
+        arrival = min(distance_in_km/3.5, 0.6*window_length)
+        width = 10. + distance_in_km/50.
+        amplitude = 1.e-15/np.sqrt(distance_in_km)
+
+        traces = []
+        for channel in CHANNELS:
+            phase = rng.uniform(0., 2.*np.pi)
+            traces += [Trace(
+                amplitude*np.exp(-((t-arrival)/width)**2)
+                    *np.cos(2.*np.pi*(t-arrival)/(width*0.8) + phase),
+                header={
+                    'network': station.network,
+                    'station': station.station,
+                    'location': station.location,
+                    'channel': channel,
+                    'starttime': origin.time,
+                    'delta': dt,
+                    })]
+
+        greens += [GreensTensor(traces, station=station, origin=origin,
+            id=station.id, include_mt=True, include_force=False)]
+
+        stream = Stream(greens[-1].get_synthetics(mt, components=['Z', 'R', 'T']))
+        for trace in stream:
+            trace.data = trace.data + noise_level*np.std(trace.data)*\
+                rng.standard_normal(trace.stats.npts)
+        stream.station = station
+        stream.origin = origin
+        stream.id = station.id
+        streams += [stream]
+
+    return Dataset(streams, id='synthetic'), GreensTensorList(greens), origin, mt
+
+
+def synthetic_grid(grid_type, size, magnitude=SOURCE['Mw']):
+    """ Returns a full moment tensor random grid ('random', `size` points),
+    a full moment tensor quasi-random grid ('sobol' or 'halton', `size`
+    points) or a regular double couple grid ('dc', `size` points per axis)
+    """
+    if grid_type == 'random':
+        return FullMomentTensorGridRandom(npts=size, magnitudes=[magnitude])
+    elif grid_type in ('sobol', 'halton'):
+        return FullMomentTensorGridQuasiRandom(npts=size, magnitudes=[magnitude],
+            sequence=grid_type)
+    elif grid_type == 'dc':
+        return DoubleCoupleGridRegular(npts_per_axis=size, magnitudes=[magnitude])
+    else:
+        raise ValueError('Unknown grid type: %s' % grid_type)
+
+
+def evaluate_synthetic(data, greens, origin, misfit_functions, labels, grid):
+    """ Evaluates misfit of a synthetic event on `grid`, returning one
+    surface per data type
+    """
+    from mtbench import _evaluate
+
+    return _evaluate(
+        [data]*len(labels), [greens]*len(labels), misfit_functions, labels,
+        data.get_stations(), origin, grid,
+        station_batching=True,
+        station_workers=1,
+        station_contributions=False,
+        store=None,
+        verbose=False)[1]
+
+
+def run_case(nstations=10, grid=('random', 10000), window_length=300.,
+    data_types=('rayleigh', 'love'), noise_level=0.05, seed=0):
+    """ Runs a single benchmark case and returns a row of the results table
+    """
+    from mtbench import _get_misfit_rayleigh, _get_misfit_love
+
+    distances = np.linspace(50., 500., nstations)
+    data, greens, origin, source = synthetic_event(distances,
+        window_length=window_length, noise_level=noise_level, seed=seed)
+
+    misfits = {'rayleigh': _get_misfit_rayleigh, 'love': _get_misfit_love}
+
+    _grid = synthetic_grid(*grid)
+
+    start = time.perf_counter()
+    results_sum = evaluate_synthetic(data, greens, origin,
+        [misfits[label]([-5., +5.]) for label in data_types], list(data_types),
+        _grid)
+    wall_time = time.perf_counter() - start
+
+    best_source = _grid.get(sum(results_sum).source_idxmin())
+
+    return {
+        'nstations': nstations,
+        'grid': grid[0],
+        'grid_size': _grid.size,
+        'window_length': window_length,
+        'data_types': '+'.join(data_types),
+        'wall_time': wall_time,
+        'throughput': _grid.size*nstations*len(data_types)/wall_time,
+        'peak_rss_mb': peak_rss()/2.**20,
+        'angular_error': float(angular_distance(best_source, source)),
+        }
+
+
+# each sweep varies one parameter about the baseline case
+BASELINE = {
+    'nstations': 10,
+    'grid': ('random', 10000),
+    'window_length': 300.,
+    'data_types': ('rayleigh', 'love'),
+    }
+
+SWEEPS = {
+    'nstations': [5, 10, 20, 40],
+    'grid': [('random', 1000), ('random', 10000), ('random', 100000),
+             ('dc', 10), ('dc', 20), ('dc', 40)],
+    'window_length': [150., 300., 600.],
+    'data_types': [('rayleigh',), ('love',), ('rayleigh', 'love')],
+    }
+
+
+def run_synthetic_benchmark(sweeps=SWEEPS, baseline=BASELINE,
+    path_output='.', seed=0):
+    """ Sweeps station count, grid size, window length and data types,
+    writing a table of throughput, peak memory and recovered source error
+
+    Each case runs in a fresh process, so peak memory is per case
+    """
+    rows = []
+
+    with get_context().Pool(processes=1, maxtasksperchild=1) as pool:
+        for name, values in sweeps.items():
+            for value in values:
+                kwargs = dict(baseline, seed=seed)
+                kwargs[name] = value
+
+                row = pool.apply(run_case, kwds=kwargs)
+                rows += [dict(sweep=name, **row)]
+                _print_row(rows[-1], header=len(rows)==1)
+
+    os.makedirs(path_output, exist_ok=True)
+    filename = join(path_output, 'synthetic_benchmark.csv')
+    with open(filename, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print('\nwrote %s\n' % filename)
+    return rows
+
+
+def _print_row(row, header=False):
+    if header:
+        print('%-14s %9s %-7s %9s %7s %-14s %9s %12s %9s %9s' % (
+            'sweep', 'stations', 'grid', 'npts', 'window', 'data types',
+            'wall [s]', 'pts/s', 'rss [MB]', 'err [deg]'))
+    print('%-14s %9d %-7s %9d %7.0f %-14s %9.2f %12.0f %9.1f %9.2f' % (
+        row['sweep'], row['nstations'], row['grid'], row['grid_size'],
+        row['window_length'], row['data_types'], row['wall_time'],
+        row['throughput'], row['peak_rss_mb'], row['angular_error']))
+
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+#
+# Compares coarse-to-fine adaptive search against brute-force evaluation of
+# fixed grids on a synthetic event, checking runtime and the angular distance
+# of the best source from the true source
+#
+
+import numpy as np
+from time import perf_counter
+from mtbench import _get_misfit_rayleigh, _get_misfit_love
+from mtbench._adaptive import AdaptiveSearch
+from mtbench._math import angular_distance
+from mtbench._synthetic import evaluate_synthetic, synthetic_event,\
+    synthetic_grid, SOURCE
+
+
+def _best(grid, results_sum):
+    return grid.get(sum(results_sum).source_idxmin())
+
+
+if __name__=='__main__':
+    labels = ['rayleigh', 'love']
+    misfits = [_get_misfit_rayleigh([-5., +5.]), _get_misfit_love([-5., +5.])]
+
+    data, greens, origin, source = synthetic_event(np.linspace(50., 500., 10))
+
+    print('%-28s %9s %9s %10s' % ('search', 'npts', 'wall [s]', 'err [deg]'))
+
+    for grid_type, size in (('random', 10000), ('random', 100000), ('dc', 20), ('dc', 40)):
+        grid = synthetic_grid(grid_type, size, SOURCE['Mw'])
+
+        start = perf_counter()
+        results_sum = evaluate_synthetic(data, greens, origin, misfits, labels,
+            grid)
+        elapsed = perf_counter() - start
+
+        print('%-28s %9d %9.2f %10.2f' % ('brute force %s:%d' % (grid_type, size),
+            grid.size, elapsed, angular_distance(_best(grid, results_sum), source)))
+
+    for grid_type, size in (('random', 1000), ('dc', 10)):
+        grid = synthetic_grid(grid_type, size, SOURCE['Mw'])
+
+        start = perf_counter()
+        grid, results_sum = AdaptiveSearch(verbose=False)(
+            lambda _grid: evaluate_synthetic(data, greens, origin, misfits,
+                labels, _grid), grid)
+        elapsed = perf_counter() - start
+
+        print('%-28s %9d %9.2f %10.2f' % ('adaptive from %s:%d' % (grid_type, size),
+            grid.size, elapsed, angular_distance(_best(grid, results_sum), source)))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+#
+# Compares runs of a study script with and without decimation of the
+# processed waveforms, using the study's own data processing, and checks
+# that the best source and its misfit do not change
+#
+#   python benchmark_decimation.py run_Silwal2016_FK.py --events 20090407201255351
+#
+
+import argparse
+import json
+import os
+import sys
+from os.path import join
+
+from mtbench.__main__ import _import_script
+from mtbench._density import _OPTIONS, _to_mt
+from mtbench._math import angular_distance
+
+
+def _run(script, event_id, path_output, decimate):
+    os.makedirs(path_output, exist_ok=True)
+    source_dict = script.run_event(event_id, path_output=path_output,
+        decimate=decimate, **_OPTIONS)
+
+    with open(join(path_output, event_id+'_report.json')) as file:
+        report = json.load(file)
+
+    return source_dict, report['info']['best_misfit'],\
+        report['summary']['misfit']['wall_time']
+
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('script',
+        help='study script defining run_event(), names and selected_events')
+    parser.add_argument('--events', nargs='+', default=None,
+        help='event ids to run, defaults to selected_events')
+    parser.add_argument('--tolerance', type=float, default=1.,
+        help='angular distance in degrees counted as the same source')
+    parser.add_argument('--output', default='benchmark_decimation')
+    args = parser.parse_args()
+
+    script = _import_script(args.script)
+
+    if args.events:
+        event_ids = args.events
+    else:
+        event_ids = [script.names[index] for index in script.selected_events]
+
+    rows = []
+    for event_id in event_ids:
+        original, misfit, baseline = _run(script, event_id,
+            join(args.output, event_id, 'original'), False)
+        decimated, decimated_misfit, elapsed = _run(script, event_id,
+            join(args.output, event_id, 'decimated'), True)
+
+        rows += [(event_id, baseline, elapsed,
+            float(angular_distance(_to_mt(original), _to_mt(decimated))),
+            (decimated_misfit - misfit)/misfit)]
+
+    print('\n%-20s %12s %12s %8s %10s %12s' % ('event', 'misfit [s]',
+        'decimated', 'speedup', 'diff [deg]', 'misfit diff'))
+    for event_id, baseline, elapsed, distance, difference in rows:
+        print('%-20s %12.2f %12.2f %8.1f %10.2f %11.2f%%' % (event_id,
+            baseline, elapsed, baseline/elapsed, distance, 100.*difference))
+
+    changed = [row[0] for row in rows if row[3] > args.tolerance]
+    if changed:
+        print('\nbest source changed by more than %.1f degrees: %s\n' % (
+            args.tolerance, ' '.join(changed)))
+        sys.exit(1)
+
+    print('\nbest source unchanged within %.1f degrees for all events\n' %
+        args.tolerance)
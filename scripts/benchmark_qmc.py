@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+#
+# Compares quasi-random (Sobol, Halton) and random full moment tensor grids
+# of equal size on a synthetic event, checking convergence of the best source
+# and of the marginal likelihood over the lune
+#
+
+import numpy as np
+from time import perf_counter
+from mtbench import _get_misfit_rayleigh, _get_misfit_love
+from mtbench._math import angular_distance
+from mtbench._synthetic import evaluate_synthetic, synthetic_event,\
+    synthetic_grid, SOURCE
+
+
+# lune bins for marginals
+BINS = (np.linspace(-1./3., +1./3., 11), np.linspace(-3./8.*np.pi, +3./8.*np.pi, 21))
+
+
+def _run(data, greens, origin, misfits, labels, grid):
+    return sum(evaluate_synthetic(data, greens, origin, misfits, labels, grid))
+
+
+def _marginal(grid, results, var):
+    """ Marginal likelihood over (v, w) lune bins
+    """
+    points = grid.to_dataframe()
+    values = np.asarray(results.values).flatten()
+
+    likelihood = np.exp(-(values - values.min())/(2.*var))
+    marginal, _, _ = np.histogram2d(points['v'], points['w'],
+        bins=BINS, weights=likelihood)
+    counts, _, _ = np.histogram2d(points['v'], points['w'], bins=BINS)
+
+    # average within bins, so that unequal bin counts do not bias the result
+    marginal = np.where(counts > 0, marginal/np.maximum(counts, 1), 0.)
+    return marginal/marginal.sum()
+
+
+if __name__=='__main__':
+    labels = ['rayleigh', 'love']
+    misfits = [_get_misfit_rayleigh([-5., +5.]), _get_misfit_love([-5., +5.])]
+
+    data, greens, origin, source = synthetic_event(np.linspace(50., 500., 10))
+
+    # reference marginal from a dense random grid
+    grid = synthetic_grid('random', 500000, SOURCE['Mw'])
+    results = _run(data, greens, origin, misfits, labels, grid)
+    var = float(np.asarray(results.values).min())
+    reference = _marginal(grid, results, var)
+
+    print('%-8s %9s %9s %10s %12s' % (
+        'grid', 'npts', 'wall [s]', 'err [deg]', 'marginal L1'))
+
+    for npts in (1024, 4096, 16384, 65536):
+        for grid_type in ('random', 'sobol', 'halton'):
+            grid = synthetic_grid(grid_type, npts, SOURCE['Mw'])
+
+            start = perf_counter()
+            results = _run(data, greens, origin, misfits, labels, grid)
+            elapsed = perf_counter() - start
+
+            print('%-8s %9d %9.2f %10.2f %12.4f' % (grid_type, npts, elapsed,
+                angular_distance(grid.get(results.source_idxmin()), source),
+                np.abs(_marginal(grid, results, var) - reference).sum()))
+        print()
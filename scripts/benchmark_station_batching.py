@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+#
+# Compares the one-grid-search-per-station loop against batched per-station
+# evaluation, checking that misfit surfaces agree exactly
+#
+
+import numpy as np
+from time import perf_counter
+from mtbench import _StationMisfit, _get_misfit_rayleigh, _get_misfit_love
+from _Silwal2016 import fullpath, names, depths, magnitudes,\
+    data_processing, selected_events
+from mtuq import read, open_db
+from mtuq.grid import DoubleCoupleGridRegular
+from mtuq.grid_search import grid_search
+from mtuq.util.cap import parse_station_codes, Trapezoid
+
+
+if __name__=='__main__':
+    index = selected_events[0]
+
+    event_id = names[index]
+    depth = depths[index]
+    magnitude = magnitudes[index]
+
+    model = "ak135"
+    solver = "syngine"
+
+    path_data, path_weights, path_greens = (
+        fullpath(event_id, '*BH.[zrt]'),
+        fullpath(event_id, 'weights.dat'),
+        "http://service.iris.edu/irisws/syngine/1",
+        )
+
+    grid = DoubleCoupleGridRegular(
+        npts_per_axis=40,
+        magnitudes=[magnitude],
+        )
+
+    process_bw, process_sw = data_processing(
+        path_greens, path_weights,
+        )
+
+    data = read(path_data, format='sac',
+        event_id=event_id,
+        station_id_list=parse_station_codes(path_weights),
+        tags=['units:cm', 'type:velocity'])
+
+    data.sort_by_distance()
+    stations = data.get_stations()
+
+    origin = data.get_origins()[0]
+    origin.depth_in_m = depth
+
+    db = open_db(path_greens, format=solver, model=model)
+    greens = db.get_greens_tensors(stations, origin, model)
+    greens.convolve(Trapezoid(magnitude=magnitude))
+
+    data = data.map(process_sw)
+    greens = greens.map(process_sw)
+
+    for label, misfit in (
+        ('rayleigh', _get_misfit_rayleigh([-5., +5.])),
+        ('love', _get_misfit_love([-5., +5.])),
+        ):
+
+        start = perf_counter()
+        loop = []
+        for station in stations:
+            loop += [grid_search(data.select(station), greens.select(station),
+                misfit, origin, grid, verbose=0)]
+        loop_sum = np.sum(loop, axis=0)/len(stations)
+        time_loop = perf_counter() - start
+
+        start = perf_counter()
+        station_misfit = _StationMisfit(misfit, stations, verbose=False)
+        total = grid_search(data, greens, station_misfit, origin, grid, verbose=0)
+        batched = station_misfit.surfaces(total)
+        batched_sum = total/len(stations)
+        time_batched = perf_counter() - start
+
+        assert np.array_equal(loop_sum, batched_sum.values)
+        for _j in range(len(stations)):
+            assert np.array_equal(loop[_j].values, batched[_j].values)
+
+        print('%s  stations: %d  grid points: %d' % (label, len(stations), grid.size))
+        print('  loop:    %8.2f s' % time_loop)
+        print('  batched: %8.2f s' % time_batched)
+        print('  speedup: %8.2f\n' % (time_loop/time_batched))
+
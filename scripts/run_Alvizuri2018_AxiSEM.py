@@ -1,65 +1,79 @@
 #!/usr/bin/env python
 
+import sys
 import numpy as np
-from mtbench import bench, progress
+from mtbench import bench, cached_grid, run_study
 from _Alvizuri2018 import fullpath, names, depths, magnitudes,\
     data_processing, misfit_functions, selected_events, expected_results
-from mtuq.grid import FullMomentTensorGridSemiregular
 
 
-if __name__=='__main__':
-    _i, _n = 1, len(selected_events)
+# weight file within each event directory
+weight_file = 'weights.dat'
+
 
+def run_event(event_id, grid=None, **options):
     #
-    # loop over selected events from Alvizuri2018
+    # runs a single event from Alvizuri2018
     #
 
-    for index in selected_events:
-        progress(_i, _n)
+    index = names.index(event_id)
+    depth = depths[index]
+    magnitude = magnitudes[index]
 
-        event_id = names[index]
-        depth = depths[index]
-        magnitude = magnitudes[index]
+    model = "mdj2_ak135f_celso"
+    solver = "AxiSEM"
 
-        model = "mdj2_ak135f_celso"
-        solver = "AxiSEM"
-
-        path_data, path_weights, path_greens = ( 
-            fullpath(event_id, '*BH.[zrt]'), 
-            fullpath(event_id, 'weights.dat'),
-            "/home/rmodrak/data/axisem/mdj2_ak135f_celso-2s",
-            )
+    path_data, path_weights, path_greens = ( 
+        fullpath(event_id, '*BH.[zrt]'), 
+        fullpath(event_id, weight_file),
+        "/home/rmodrak/data/axisem/mdj2_ak135f_celso-2s",
+        )
 
-        grid = FullMomentTensorGridSemiregular(
+    if grid is None:
+        grid = cached_grid('semiregular',
             npts_per_axis=10,
             magnitudes=[magnitude],
             )
 
-        process_bw, process_sw = data_processing(
-            path_greens, path_weights,
-            )
+    process_bw, process_sw = data_processing(
+        path_greens, path_weights,
+        )
 
-        bench(
-            event_id,
-            path_data,
-            path_greens,
-            path_weights,
-            solver,
-            model,
-            grid,
-            magnitude,
-            depth,
-            process_bw,
-            process_sw,
-            include_bw=False,
-            include_rayleigh=True,
-            include_love=True,
-            include_mt=True,
-            include_force=False,
-            plot_beachball=True,
-            plot_waveforms=True,
-            lune_variance_reduction=True,
-            )
+    options = dict(dict(
+        path_archive=fullpath(event_id+'.mtba'),
+        include_bw=False,
+        include_rayleigh=True,
+        include_love=True,
+        include_mt=True,
+        include_force=False,
+        plot_beachball=True,
+        plot_waveforms=True,
+        lune_variance_reduction=True,
+        ), **options)
+
+    return bench(
+        event_id,
+        path_data,
+        path_greens,
+        path_weights,
+        solver,
+        model,
+        grid,
+        magnitude,
+        depth,
+        process_bw,
+        process_sw,
+        **options)
+
+
+if __name__=='__main__':
+    #
+    # run selected events from Alvizuri2018, printing output as it goes
+    #
+
+    summaries = run_study(run_event, [names[index] for index in selected_events],
+        path_logs=None)
 
-        _i += 1
+    if any(summary['status'] != 'ok' for summary in summaries):
+        sys.exit(1)
 
@@ -1,67 +1,82 @@
 #!/usr/bin/env python
 
+import sys
 import numpy as np
-from mtbench import bench, progress
+from mtbench import bench, cached_grid, run_study
 from _Alvizuri2018 import fullpath, names, depths, magnitudes,\
     data_processing, misfit_functions, selected_events, expected_results
-from mtuq.grid import FullMomentTensorGridRandom
 
 
-if __name__=='__main__':
-    _i, _n = 1, len(selected_events)
+# weight file within each event directory
+weight_file = 'weight_celso.dat'
+
 
+def run_event(event_id, grid=None, **options):
     #
-    # loop over selected events from Alvizuri2018
+    # runs a single event from Alvizuri2018
     #
 
-    for index in selected_events:
-        progress(_i, _n)
+    index = names.index(event_id)
+    depth = depths[index]
+    magnitude = magnitudes[index]
 
-        event_id = names[index]
-        depth = depths[index]
-        magnitude = magnitudes[index]
+    #model = "1D_ak135f_no_mud"
+    model = "s40rts_crust1.0"
 
-        #model = "1D_ak135f_no_mud"
-        model = "s40rts_crust1.0"
+    solver = "SPECFEM3D"
 
-        solver = "SPECFEM3D"
-
-        path_data, path_weights, path_greens = ( 
-            fullpath(event_id, '*BH.[zrt]'), 
-            fullpath(event_id, 'weight_celso.dat'),
-            "/Users/rmodrak/Downloads/greens/output/NKT/"+model,
-            )
+    path_data, path_weights, path_greens = ( 
+        fullpath(event_id, '*BH.[zrt]'), 
+        fullpath(event_id, weight_file),
+        "/Users/rmodrak/Downloads/greens/output/NKT/"+model,
+        )
 
-        grid = FullMomentTensorGridRandom(
+    if grid is None:
+        grid = cached_grid('random',
             npts=500000,
             magnitudes=np.linspace(magnitude-1, magnitude+1, 5),
             )
 
-        process_bw, process_sw = data_processing(
-            path_greens, path_weights,
-            )
+    process_bw, process_sw = data_processing(
+        path_greens, path_weights,
+        )
 
-        print(process_sw.__dict__)
-
-        bench(
-            event_id,
-            path_data,
-            path_greens,
-            path_weights,
-            solver,
-            model,
-            grid,
-            magnitude,
-            depth,
-            process_bw,
-            process_sw,
-            include_bw=False,
-            include_rayleigh=True,
-            include_love=True,
-            include_mt=True,
-            include_force=False,
-            plot_waveforms=True,
-            )
+    print(process_sw.__dict__)
+
+    options = dict(dict(
+        path_archive=fullpath(event_id+'.mtba'),
+        include_bw=False,
+        include_rayleigh=True,
+        include_love=True,
+        include_mt=True,
+        include_force=False,
+        plot_waveforms=True,
+        ), **options)
+
+    return bench(
+        event_id,
+        path_data,
+        path_greens,
+        path_weights,
+        solver,
+        model,
+        grid,
+        magnitude,
+        depth,
+        process_bw,
+        process_sw,
+        **options)
+
+
+if __name__=='__main__':
+    #
+    # run selected events from Alvizuri2018, printing output as it goes
+    #
+
+    summaries = run_study(run_event, [names[index] for index in selected_events],
+        path_logs=None)
+
+    if any(summary['status'] != 'ok' for summary in summaries):
+        sys.exit(1)
 
-        _i += 1
 
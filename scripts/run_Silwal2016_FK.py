@@ -1,65 +1,79 @@
 #!/usr/bin/env python
 
+import sys
 import numpy as np
-from mtbench import bench, progress
+from mtbench import bench, cached_grid, run_study
 from _Silwal2016 import fullpath, names, depths, magnitudes,\
     data_processing_FK, misfit_functions, selected_events, expected_results
-from mtuq.grid import DoubleCoupleGridRegular
 
 
-if __name__=='__main__':
-    _i, _n = 1, len(selected_events)
+# weight file within each event directory
+weight_file = 'weights.dat'
+
 
+def run_event(event_id, grid=None, **options):
     #
-    # loop over selected events from Silwal2016
+    # runs a single event from Silwal2016
     #
 
-    for index in selected_events:
-        progress(_i, _n)
+    index = names.index(event_id)
+    depth = depths[index]
+    magnitude = magnitudes[index]
 
-        event_id = names[index]
-        depth = depths[index]
-        magnitude = magnitudes[index]
+    model = "scak"
+    solver = "FK"
 
-        model = "scak"
-        solver = "FK"
-
-        path_data, path_weights, path_greens = ( 
-            fullpath(event_id, '*BH.[zrt]'), 
-            fullpath(event_id, 'weights.dat'),
-            "/store/wf/FK_synthetics/scak",
-            )
+    path_data, path_weights, path_greens = ( 
+        fullpath(event_id, '*BH.[zrt]'), 
+        fullpath(event_id, weight_file),
+        "/store/wf/FK_synthetics/scak",
+        )
 
-        grid = DoubleCoupleGridRegular(
+    if grid is None:
+        grid = cached_grid('dc',
             npts_per_axis=40,
             magnitudes=[magnitude],
             )
 
-        process_bw, process_sw = data_processing_FK(
-            path_greens, path_weights,
-            )
+    process_bw, process_sw = data_processing_FK(
+        path_greens, path_weights,
+        )
 
-        bench(
-            event_id,
-            path_data,
-            path_greens,
-            path_weights,
-            solver,
-            model,
-            grid,
-            magnitude,
-            depth,
-            process_bw,
-            process_sw,
-            include_bw=True,
-            include_rayleigh=True,
-            include_love=True,
-            include_mt=True,
-            include_force=False,
-            plot_beachball=True,
-            plot_waveforms=True,
-            dc_misfit=True,
-            )
+    options = dict(dict(
+        path_archive=fullpath(event_id+'.mtba'),
+        include_bw=True,
+        include_rayleigh=True,
+        include_love=True,
+        include_mt=True,
+        include_force=False,
+        plot_beachball=True,
+        plot_waveforms=True,
+        dc_misfit=True,
+        ), **options)
+
+    return bench(
+        event_id,
+        path_data,
+        path_greens,
+        path_weights,
+        solver,
+        model,
+        grid,
+        magnitude,
+        depth,
+        process_bw,
+        process_sw,
+        **options)
+
+
+if __name__=='__main__':
+    #
+    # run selected events from Silwal2016, printing output as it goes
+    #
+
+    summaries = run_study(run_event, [names[index] for index in selected_events],
+        path_logs=None)
 
-        _i += 1
+    if any(summary['status'] != 'ok' for summary in summaries):
+        sys.exit(1)
 
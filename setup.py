@@ -17,6 +17,9 @@ setup(
         "seismology"
     ],
     python_requires='>=3',
+    entry_points={
+        'console_scripts': ['mtbench=mtbench.__main__:main'],
+    },
     install_requires=[
         "numpy", "scipy", "obspy", 
         "h5py", "retry", "flake8>=3.0", "pytest", "nose",
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+#
+# Packed waveform archives read back the same data as mtuq's SAC reader
+#
+
+import os
+from os.path import join
+
+import pytest
+
+pytest.importorskip('mtuq')
+
+import numpy as np
+import obspy
+from obspy import Trace, UTCDateTime
+from mtuq import read
+
+from mtbench._archive import is_current, pack, read_archive
+
+
+EVENT_ID = '20090407201255351'
+STATIONS = [('IU', 'ABC', '00', 40., -150.), ('XX', 'DEF', '', 41., -148.)]
+
+
+def _write_sac(dirname):
+    """ Writes a small event of three-component SAC files
+    """
+    rng = np.random.default_rng(0)
+    for network, station, location, stla, stlo in STATIONS:
+        for component in 'ZRT':
+            trace = Trace(data=rng.standard_normal(500).astype(np.float32),
+                header={
+                    'network': network,
+                    'station': station,
+                    'location': location,
+                    'channel': 'BH'+component,
+                    'starttime': UTCDateTime('2009-04-07T20:12:55.351'),
+                    'delta': 0.05,
+                    })
+            trace.stats.sac = obspy.core.AttribDict({
+                'stla': stla, 'stlo': stlo,
+                'evla': 39., 'evlo': -149., 'evdp': 30.,
+                'o': 0.,
+                })
+            trace.write(join(dirname, '%s.%s.%s.BH.%s' % (
+                network, station, location, component.lower())), format='SAC')
+    return join(dirname, '*BH.[zrt]')
+
+
+def test_identical_to_sac(tmp_path):
+    path_data = _write_sac(str(tmp_path))
+    filename = pack(path_data, str(tmp_path/(EVENT_ID+'.mtba')))
+
+    expected = read(path_data, format='sac', event_id=EVENT_ID,
+        tags=['units:cm', 'type:velocity'])
+    actual = read_archive(filename, event_id=EVENT_ID,
+        tags=['units:cm', 'type:velocity'])
+
+    expected.sort_by_distance()
+    actual.sort_by_distance()
+
+    assert len(actual) == len(expected)
+    for stream, reference in zip(actual, expected):
+        assert dict(stream.station) == dict(reference.station)
+        assert dict(stream.origin) == dict(reference.origin)
+        assert len(stream) == len(reference)
+
+        for trace, other in zip(stream, reference):
+            assert trace.id == other.id
+            assert trace.stats.starttime == other.stats.starttime
+            assert trace.stats.delta == other.stats.delta
+            assert dict(trace.stats.sac) == dict(other.stats.sac)
+            assert trace.data.dtype == other.data.dtype
+            assert np.array_equal(trace.data, other.data)
+
+
+def test_is_current(tmp_path):
+    path_data = _write_sac(str(tmp_path))
+    filename = pack(path_data, str(tmp_path/(EVENT_ID+'.mtba')))
+
+    assert is_current(filename, path_data)
+
+    # a SAC file modified after packing
+    sac = sorted(tmp_path.glob('*BH.z'))[0]
+    os.utime(str(sac), (sac.stat().st_atime, sac.stat().st_mtime + 10.))
+    assert not is_current(filename, path_data)
+
+    # only the archive installed
+    for sac in tmp_path.glob('*BH.?'):
+        os.remove(str(sac))
+    assert is_current(filename, path_data)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+#
+# Keys of the result and Green's tensor caches
+#
+
+import pytest
+
+pytest.importorskip('mtuq')
+
+import numpy as np
+
+from mtbench._cache import cache_key
+
+
+class _Model(object):
+    # stands in for derived state such as an obspy TauPyModel
+    def __init__(self):
+        self.table = np.array([object()])
+
+
+class _ProcessData(object):
+    def __init__(self, filter_type=None, pick_type=None, **parameters):
+        self.filter_type = filter_type
+        self.pick_type = pick_type
+        for name, value in parameters.items():
+            setattr(self, name, value)
+        self._taup = _Model()
+        self.taup = self._taup
+
+
+def test_parameters():
+    key = cache_key(_ProcessData('bandpass', 'taup', freq_max=0.1))
+
+    assert key == cache_key(_ProcessData('bandpass', 'taup', freq_max=0.1))
+    assert key != cache_key(_ProcessData('bandpass', 'taup', freq_max=0.2))
+    assert key != cache_key(_ProcessData('lowpass', 'taup', freq_max=0.1))
+
+
+def test_object_arrays():
+    with pytest.raises(ValueError):
+        cache_key(np.array([object()]))
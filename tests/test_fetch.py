@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+#
+# Installs a small study from a local mirror holding a split archive
+#
+
+import hashlib
+import io
+import os
+import subprocess
+import tarfile
+from os.path import exists, join
+
+import pytest
+
+pytest.importorskip('mtuq')
+
+from mtbench import _fetch
+
+
+STUDY = 'Alvizuri2018'
+EVENTS = ['EVENT1', 'EVENT2', 'EVENT3']
+
+
+def _mirror(dirname, nparts=3, checksums=True, members=None):
+    """ Writes a gzipped tar of the study split into parts, as in the data
+    branches
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        for name, data in members or _members():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+    data = buffer.getvalue()
+    size = -(-len(data)//nparts)
+
+    os.makedirs(dirname)
+    lines = ''
+    for _k in range(nparts):
+        part = data[_k*size:(_k+1)*size]
+        with open(join(dirname, 'part%d' % _k), 'wb') as file:
+            file.write(part)
+        lines += '%s  part%d\n' % (hashlib.sha256(part).hexdigest(), _k)
+
+    if checksums:
+        with open(join(dirname, _fetch.CHECKSUMS), 'w') as file:
+            file.write(lines)
+    return dirname
+
+
+def _members():
+    return [('%s/%s/IU.ABC.00.BH%s' % (STUDY, event, component),
+        ('%s %s' % (event, component)).encode())
+        for event in EVENTS for component in 'zrt']
+
+
+@pytest.fixture(autouse=True)
+def no_study_module(monkeypatch):
+    # event lists come from the archive, not the real study module
+    monkeypatch.setattr(_fetch, '_names', lambda study: None)
+
+
+def test_install(tmp_path):
+    source = _mirror(str(tmp_path/'mirror'))
+
+    extracted = _fetch.fetch(STUDY, source=source,
+        path_waveforms=str(tmp_path/'waveforms'), verbose=False)
+
+    path_study = str(tmp_path/'waveforms'/STUDY)
+    assert sorted(extracted) == EVENTS
+    assert _fetch.installed_events(path_study) == set(EVENTS)
+    with open(join(path_study, 'EVENT2', 'IU.ABC.00.BHr'), 'rb') as file:
+        assert file.read() == b'EVENT2 r'
+
+
+def test_skip_installed(tmp_path):
+    source = _mirror(str(tmp_path/'mirror'))
+    path_waveforms = str(tmp_path/'waveforms')
+    _fetch.fetch(STUDY, source=source, path_waveforms=path_waveforms,
+        verbose=False)
+
+    # a complete install needs no parts at all
+    for _k in range(3):
+        os.remove(join(source, 'part%d' % _k))
+
+    assert _fetch.fetch(STUDY, source=source, path_waveforms=path_waveforms,
+        verbose=False) == []
+
+
+def test_resume(tmp_path):
+    source = _mirror(str(tmp_path/'mirror'))
+    path_waveforms = str(tmp_path/'waveforms')
+    _fetch.fetch(STUDY, source=source, path_waveforms=path_waveforms,
+        verbose=False)
+
+    # as if interrupted while extracting EVENT3
+    os.remove(join(path_waveforms, STUDY, 'EVENT3', _fetch.MARKER))
+
+    assert _fetch.fetch(STUDY, source=source, path_waveforms=path_waveforms,
+        verbose=False) == ['EVENT3']
+
+
+def test_checksum_mismatch(tmp_path):
+    source = _mirror(str(tmp_path/'mirror'))
+    with open(join(source, 'part1'), 'ab') as file:
+        file.write(b'x')
+
+    with pytest.raises(ValueError):
+        _fetch.fetch(STUDY, source=source,
+            path_waveforms=str(tmp_path/'waveforms'), verbose=False)
+
+
+def test_checksums_recorded(tmp_path):
+    source = _mirror(str(tmp_path/'mirror'), checksums=False)
+    path_waveforms = str(tmp_path/'waveforms')
+
+    # without checksums in the source, the first install records them
+    assert len(_fetch.fetch(STUDY, source=source,
+        path_waveforms=path_waveforms, verbose=False)) == 3
+    assert exists(join(path_waveforms, STUDY, _fetch.CHECKSUMS))
+
+    # and later fetches are checked against them
+    os.remove(join(path_waveforms, STUDY, 'EVENT3', _fetch.MARKER))
+    with open(join(source, 'part2'), 'ab') as file:
+        file.write(b'x')
+
+    with pytest.raises(ValueError):
+        _fetch.fetch(STUDY, source=source, path_waveforms=path_waveforms,
+            verbose=False)
+
+    assert _fetch.fetch(STUDY, source=source, verify=False,
+        path_waveforms=path_waveforms, verbose=False) == ['EVENT3']
+
+
+def test_git_source(tmp_path):
+    # a data branch as upstream publishes them, holding only part files
+    repo = _mirror(str(tmp_path/'repo'), checksums=False)
+
+    def git(*args):
+        subprocess.run(['git', '-C', repo, '-c', 'user.name=mtbench',
+            '-c', 'user.email=mtbench@localhost'] + list(args),
+            check=True, capture_output=True)
+
+    git('init', '-q', '-b', _fetch.BRANCHES[STUDY])
+    git('add', '.')
+    git('commit', '-q', '-m', 'waveforms')
+
+    extracted = _fetch.fetch(STUDY, source=repo,
+        path_waveforms=str(tmp_path/'waveforms'), verbose=False)
+
+    assert sorted(extracted) == EVENTS
+
+
+@pytest.mark.parametrize('name', [
+    '../outside',
+    '%s/../../outside' % STUDY,
+    '/etc/passwd',
+    ])
+def test_unsafe_path(tmp_path, name):
+    with pytest.raises(ValueError):
+        _fetch._event(name, STUDY)
+
+    source = _mirror(str(tmp_path/'mirror'), members=[(name, b'x')])
+    with pytest.raises(ValueError):
+        _fetch.fetch(STUDY, source=source,
+            path_waveforms=str(tmp_path/'waveforms'), verbose=False)
+
+    assert not exists(str(tmp_path/'outside'))
+
+
+def test_event():
+    assert _fetch._event('%s/EVENT1/file' % STUDY, STUDY) == ('EVENT1', 'EVENT1/file')
+    assert _fetch._event('EVENT1/file', STUDY) == ('EVENT1', 'EVENT1/file')
+    assert _fetch._event('README', STUDY) == (None, None)
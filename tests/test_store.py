@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+#
+# Per-station surfaces of grid searches over unstructured grids, which
+# return DataFrames rather than DataArrays
+#
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('mtuq')
+
+import numpy as np
+import pandas
+from mtuq.grid_search import MTUQDataFrame
+
+from mtbench import _StationMisfit
+from mtbench._store import StationStore, open_station_store
+
+
+NSOURCES, NORIGINS = 5, 2
+
+
+class _Data(object):
+    def select(self, station):
+        return station.number
+
+
+def _misfit(data, greens, sources):
+    # distinct values for each station, origin and source
+    return (100.*data + 10.*greens + np.arange(NSOURCES)).reshape(-1, 1)
+
+
+def _search(station_misfit):
+    """ Calls the misfit function once per origin, as grid_search does, and
+    returns the result indexed like grid_search over an UnstructuredGrid
+    """
+    values = np.concatenate([station_misfit(_Data(), _Greens(origin), None)
+        for origin in range(NORIGINS)]).flatten()
+
+    index = pandas.MultiIndex.from_arrays([
+        np.repeat(np.arange(NORIGINS), NSOURCES),
+        np.tile(np.arange(NSOURCES), NORIGINS)],
+        names=['origin_idx', 'source_idx'])
+
+    return MTUQDataFrame({0: values}, index=index)
+
+
+class _Greens(object):
+    def __init__(self, origin):
+        self.origin = origin
+
+    def select(self, station):
+        return self.origin
+
+
+def _expected(station):
+    return np.concatenate([_misfit(station.number, origin, None).flatten()
+        for origin in range(NORIGINS)])
+
+
+@pytest.mark.parametrize('stored', [False, True])
+def test_unstructured(tmp_path, stored):
+    stations = [SimpleNamespace(id='XX.S%d.' % _j, number=_j)
+        for _j in range(3)]
+    store = StationStore(str(tmp_path/'store')) if stored else None
+
+    station_misfit = _StationMisfit(_misfit, stations, store=store,
+        label='rayleigh', verbose=False)
+    total = _search(station_misfit)
+
+    surfaces = station_misfit.surfaces(total)
+
+    assert len(surfaces) == len(stations)
+    for station, surface in zip(stations, surfaces):
+        assert isinstance(surface, pandas.DataFrame)
+        assert surface.index.equals(total.index)
+        assert np.array_equal(surface.values.flatten(), _expected(station))
+
+    if stored:
+        reopened = open_station_store(str(tmp_path/'store'))
+        for station, surface in zip(stations, reopened.surfaces('rayleigh')):
+            assert surface.index.equals(total.index)
+            assert np.array_equal(surface.values.flatten(), _expected(station))
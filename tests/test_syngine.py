@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+#
+# Prefetches from a local HTTP stand-in for the syngine service
+#
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.request import urlopen
+
+import pytest
+
+pytest.importorskip('mtuq')
+
+from mtbench._syngine import prefetch_syngine
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            server.paths += [self.path]
+
+        time.sleep(0.05)
+
+        with server.lock:
+            server.active -= 1
+
+        status = 500 if 'distance=0.0' in self.path else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.lock = threading.Lock()
+    server.active, server.peak, server.paths = 0, 0, []
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _download(url, model, station, origin):
+    # stands in for mtuq's client, which builds the same kind of query
+    with urlopen('%s/query?model=%s&distance=%s&depth=%s' % (url, model,
+        station.distance_in_m, origin.depth_in_m)) as response:
+        return response.read()
+
+
+def _events():
+    origin = SimpleNamespace(depth_in_m=1000., time='2000-01-01T00:00:00')
+    stations = [SimpleNamespace(id='XX.S%02d.' % _j,
+        distance_in_m=1000.*(_j+1)) for _j in range(20)]
+
+    # two events sharing stations and depth, plus a second depth
+    deeper = SimpleNamespace(depth_in_m=2000., time=origin.time)
+    return [(stations, [origin]), (stations, [origin]), (stations[:5], [deeper])]
+
+
+def test_prefetch(server):
+    url = 'http://127.0.0.1:%d' % server.server_port
+
+    failed = prefetch_syngine(_events(), url=url, connections=4,
+        download=_download, verbose=False)
+
+    assert failed == []
+    assert len(server.paths) == 25
+    assert len(set(server.paths)) == 25
+    assert 1 < server.peak <= 4
+
+
+def test_prefetch_failures(server):
+    url = 'http://127.0.0.1:%d' % server.server_port
+    origin = SimpleNamespace(depth_in_m=1000., time='2000-01-01T00:00:00')
+    stations = [SimpleNamespace(id='XX.BAD.', distance_in_m=0.),
+        SimpleNamespace(id='XX.GOOD.', distance_in_m=1000.)]
+
+    failed = prefetch_syngine([(stations, [origin])], url=url, connections=2,
+        download=_download, verbose=False)
+
+    assert [station.id for station, _, _ in failed] == ['XX.BAD.']